@@ -0,0 +1,504 @@
+"""
+Local stand-ins for OpenAI, Serper and GitHub that replay the recorded
+responses in benchmarks/fixtures with configurable latency and error rates.
+
+Run with:
+
+    python -m benchmarks.fake_services --port 8900 \
+        --latency openai=1.5:0.4 --latency serper=0.6 --error-rate openai=0.01
+
+and point grosbeak at it with OPENAI_BASE_URL=http://127.0.0.1:8900/openai/v1,
+SERPER_SCRAPE_URL=http://127.0.0.1:8900/serper/scrape,
+SERPER_SEARCH_URL=http://127.0.0.1:8900/serper/search and
+GITHUB_API_URL=http://127.0.0.1:8900/github.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from aiohttp import web
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+SERVICES = ("openai", "serper", "github")
+
+# Mirrors the provider's prompt caching: prefixes of at least 1024 tokens
+# are cached in 128-token increments
+CACHE_MIN_TOKENS = 1024
+CACHE_INCREMENT_TOKENS = 128
+CHARS_PER_TOKEN = 4
+# How the section writer asks for one section of the resume
+SECTION_REQUEST = re.compile(r"Start with the heading `## ([^`]+)`")
+
+
+def load_fixture(name: str) -> Any:
+    with open(os.path.join(FIXTURES_DIR, name)) as file:
+        if name.endswith(".json"):
+            return json.load(file)
+        return file.read()
+
+
+class ServiceProfile:
+    """
+    Latency is log-normal around `median` seconds; `sigma` controls the
+    tail (0 gives a constant delay).
+    """
+
+    def __init__(self,
+                 median: float = 0.0,
+                 sigma: float = 0.0,
+                 error_rate: float = 0.0):
+        self.median = median
+        self.sigma = sigma
+        self.error_rate = error_rate
+
+    def sample_delay(self) -> float:
+        if self.median <= 0:
+            return 0.0
+        return self.median * math.exp(random.gauss(0.0, self.sigma))
+
+    def should_fail(self) -> bool:
+        return random.random() < self.error_rate
+
+
+class PrefixCache:
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self._prefixes: "OrderedDict[str, None]" = OrderedDict()
+
+    def cached_tokens(self, prompt: str) -> int:
+        """
+        Returns how many leading tokens of the prompt were seen before and
+        records every cacheable prefix of it.
+        """
+        step = CACHE_INCREMENT_TOKENS * CHARS_PER_TOKEN
+        start = CACHE_MIN_TOKENS * CHARS_PER_TOKEN
+        cached = 0
+        for end in range(start, len(prompt) + 1, step):
+            key = hashlib.sha256(prompt[:end].encode("utf-8")).hexdigest()
+            if key in self._prefixes:
+                self._prefixes.move_to_end(key)
+                cached = end // CHARS_PER_TOKEN
+            else:
+                self._prefixes[key] = None
+        while len(self._prefixes) > self.max_entries:
+            self._prefixes.popitem(last=False)
+        return cached
+
+
+class RateLimitWindow:
+    """
+    A GitHub-style quota: `limit` requests per `period` seconds, reported
+    through X-RateLimit-* headers.
+    """
+
+    def __init__(self, resource: str, limit: int, period: float):
+        self.resource = resource
+        self.limit = limit
+        self.period = period
+        self.remaining = limit
+        self.reset_at = time.time() + period
+
+    def headers(self) -> Dict[str, str]:
+        if time.time() >= self.reset_at:
+            self.remaining = self.limit
+            self.reset_at = time.time() + self.period
+        return {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(max(0, self.remaining)),
+            "X-RateLimit-Reset": str(int(self.reset_at)),
+            "X-RateLimit-Resource": self.resource,
+        }
+
+
+class FakeServices:
+
+    def __init__(self,
+                 profiles: Dict[str, ServiceProfile],
+                 jsonld_rate: float = 0.5,
+                 github_quota: int = 5000,
+                 tokens_per_second: float = 0.0):
+        self.profiles = profiles
+        self.jsonld_rate = jsonld_rate
+        # Output-token generation speed; 0 returns completions instantly
+        self.tokens_per_second = tokens_per_second
+        self.github_windows = {
+            "core": RateLimitWindow("core", github_quota, 3600.0),
+            "search": RateLimitWindow("search", 30, 60.0),
+        }
+        self.requests: Counter = Counter()
+        self.not_modified: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.prefix_cache = PrefixCache()
+        self.serper_job = load_fixture("serper_job.json")
+        self.serper_job_jsonld = load_fixture("serper_job_jsonld.json")
+        self.serper_linkedin = load_fixture("serper_linkedin.json")
+        self.serper_search = load_fixture("serper_search.json")
+        self.github_user_data = load_fixture("github_user.json")
+        self.github_repos_data = load_fixture("github_repos.json")
+        self.github_languages_data = load_fixture("github_languages.json")
+        self.tool_results = load_fixture("openai_tools.json")
+        self.agent_resume = load_fixture("agent_resume.md")
+        self.resume_sections = {
+            section.split("\n", 1)[0].strip(): f"## {section.strip()}\n"
+            for section in self.agent_resume.split("\n## ")[1:]
+        }
+
+    async def simulate(self, service: str) -> Optional[web.Response]:
+        """
+        Sleeps for the service's sampled latency and returns an error
+        response if this request should fail.
+        """
+        profile = self.profiles[service]
+        self.requests[service] += 1
+        await asyncio.sleep(profile.sample_delay())
+        if not profile.should_fail():
+            return None
+        self.errors[service] += 1
+        if service == "openai":
+            return web.json_response(
+                {
+                    "error": {
+                        "message": "Rate limit reached (simulated)",
+                        "type": "requests",
+                        "code": "rate_limit_exceeded",
+                    }
+                },
+                status=429,
+                headers={"retry-after": "1"})
+        return web.json_response({"message": "Simulated upstream error"},
+                                 status=500)
+
+    # OpenAI
+
+    def usage(self, messages: List[Dict[str, Any]],
+              completion: str) -> Dict[str, Any]:
+        prompt = "".join(
+            str(message.get("content") or "") for message in messages)
+        return {
+            "prompt_tokens": len(prompt) // CHARS_PER_TOKEN + 1,
+            "completion_tokens": len(completion) // CHARS_PER_TOKEN + 1,
+            "total_tokens": (len(prompt) + len(completion)) // CHARS_PER_TOKEN
+            + 2,
+            "prompt_tokens_details": {
+                "cached_tokens": self.prefix_cache.cached_tokens(prompt)
+            },
+        }
+
+    def completion_message(
+            self, body: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+        tools = body.get("tools") or []
+        if not tools:
+            messages = body.get("messages") or [{}]
+            match = SECTION_REQUEST.search(
+                str(messages[-1].get("content") or ""))
+            content = (self.resume_sections.get(match.group(1), "")
+                       if match else self.agent_resume)
+            return {"role": "assistant", "content": content}, content
+        name = tools[0]["function"]["name"]
+        arguments = json.dumps(self.tool_results.get(name, {}))
+        return {
+            "role":
+            "assistant",
+            "content":
+            None,
+            "tool_calls": [{
+                "id": f"call_{uuid.uuid4().hex[:24]}",
+                "type": "function",
+                "function": {
+                    "name": name,
+                    "arguments": arguments
+                },
+            }],
+        }, arguments
+
+    def generation_delay(self, completion: str) -> float:
+        if self.tokens_per_second <= 0:
+            return 0.0
+        return len(completion) / CHARS_PER_TOKEN / self.tokens_per_second
+
+    async def chat_completions(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        error = await self.simulate("openai")
+        if error is not None:
+            return error
+        message, completion = self.completion_message(body)
+        usage = self.usage(body.get("messages", []), completion)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        model = body.get("model", "gpt-4o")
+        if not body.get("stream"):
+            await asyncio.sleep(self.generation_delay(completion))
+            return web.json_response({
+                "id":
+                completion_id,
+                "object":
+                "chat.completion",
+                "created":
+                created,
+                "model":
+                model,
+                "choices": [{
+                    "index": 0,
+                    "message": message,
+                    "finish_reason": "stop"
+                }],
+                "usage":
+                usage,
+            })
+
+        response = web.StreamResponse(
+            headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+
+        async def send(choices: List[Dict[str, Any]],
+                       chunk_usage: Optional[Dict[str, Any]] = None) -> None:
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": choices,
+                "usage": chunk_usage,
+            }
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+
+        for start in range(0, len(completion), 40):
+            await asyncio.sleep(
+                self.generation_delay(completion[start:start + 40]))
+            await send([{
+                "index": 0,
+                "delta": {
+                    "content": completion[start:start + 40]
+                },
+                "finish_reason": None,
+            }])
+        await send([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        await send([], usage)
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    # Serper
+
+    def job_fixture(self, url: str) -> Dict[str, Any]:
+        """
+        Returns the posting with JobPosting JSON-LD for a stable fraction
+        of URLs, so the same URL always gets the same page.
+        """
+        bucket = int(hashlib.sha256(url.encode("utf-8")).hexdigest()[:8],
+                     16) / 0xffffffff
+        return (self.serper_job_jsonld
+                if bucket < self.jsonld_rate else self.serper_job)
+
+    async def scrape(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        error = await self.simulate("serper")
+        if error is not None:
+            return error
+        url = body.get("url", "")
+        fixture = (self.serper_linkedin
+                   if "linkedin.com" in url else self.job_fixture(url))
+        # Echo the URL so each scraped page (and its parse prompt) differs
+        return web.json_response({
+            **fixture, "metadata": {
+                **fixture.get("metadata", {}), "url": url
+            }
+        })
+
+    async def search(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        error = await self.simulate("serper")
+        if error is not None:
+            return error
+        queries = body if isinstance(body, list) else [body]
+        results = [{
+            **self.serper_search, "searchParameters": {
+                "q": query.get("q", ""),
+                "type": "search"
+            }
+        } for query in queries]
+        return web.json_response(results if isinstance(body, list) else
+                                 results[0])
+
+    # GitHub
+
+    def github_json(self,
+                    request: web.Request,
+                    body: Any,
+                    resource: str = "core",
+                    headers: Optional[Dict[str, str]] = None) -> web.Response:
+        """
+        Answers like the GitHub API: with an ETag, a 304 when the client's
+        If-None-Match still matches (which does not use quota), and a 403
+        once the resource's quota is used up.
+        """
+        window = self.github_windows[resource]
+        text = json.dumps(body)
+        etag = f'"{hashlib.sha256(text.encode()).hexdigest()[:32]}"'
+        rate_headers = window.headers()
+        if request.headers.get("If-None-Match") == etag:
+            self.not_modified["github"] += 1
+            return web.Response(status=304,
+                                headers={
+                                    **rate_headers, "ETag": etag
+                                })
+        if window.remaining <= 0:
+            self.errors["github"] += 1
+            return web.json_response(
+                {"message": "API rate limit exceeded (simulated)"},
+                status=403,
+                headers=rate_headers)
+        window.remaining -= 1
+        return web.json_response(body,
+                                 headers={
+                                     **(headers or {}),
+                                     **window.headers(), "ETag": etag
+                                 })
+
+    async def github_user(self, request: web.Request) -> web.Response:
+        error = await self.simulate("github")
+        if error is not None:
+            return error
+        return self.github_json(request, {
+            **self.github_user_data, "login": request.match_info["username"]
+        })
+
+    async def github_user_repos(self, request: web.Request) -> web.Response:
+        error = await self.simulate("github")
+        if error is not None:
+            return error
+        page = int(request.query.get("page", "1"))
+        per_page = int(request.query.get("per_page", "30"))
+        start = (page - 1) * per_page
+        repos = self.github_repos_data[start:start + per_page]
+        last_page = max(1, math.ceil(len(self.github_repos_data) / per_page))
+        links = []
+        if page < last_page:
+            next_url = request.url.with_query(page=page + 1, per_page=per_page)
+            links.append(f'<{next_url}>; rel="next"')
+        last_url = request.url.with_query(page=last_page, per_page=per_page)
+        links.append(f'<{last_url}>; rel="last"')
+        return self.github_json(request,
+                                repos,
+                                headers={"Link": ", ".join(links)})
+
+    async def github_search_commits(self,
+                                    request: web.Request) -> web.Response:
+        error = await self.simulate("github")
+        if error is not None:
+            return error
+        return self.github_json(request, {
+            "total_count": 812,
+            "items": []
+        },
+                                resource="search")
+
+    async def github_languages(self, request: web.Request) -> web.Response:
+        error = await self.simulate("github")
+        if error is not None:
+            return error
+        return self.github_json(request, self.github_languages_data)
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "requests": dict(self.requests),
+            "errors": dict(self.errors),
+            "not_modified": dict(self.not_modified),
+        })
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/openai/v1/chat/completions",
+                            self.chat_completions)
+        app.router.add_post("/serper/scrape", self.scrape)
+        app.router.add_post("/serper/search", self.search)
+        app.router.add_get("/github/users/{username}", self.github_user)
+        app.router.add_get("/github/users/{username}/repos",
+                           self.github_user_repos)
+        app.router.add_get("/github/search/commits",
+                           self.github_search_commits)
+        app.router.add_get("/github/repos/{owner}/{repo}/languages",
+                           self.github_languages)
+        app.router.add_get("/_stats", self.stats)
+        return app
+
+
+def parse_service_values(values: List[str], option: str) -> Dict[str, str]:
+    parsed = {}
+    for value in values:
+        service, _, setting = value.partition("=")
+        if service not in SERVICES or not setting:
+            raise argparse.ArgumentTypeError(
+                f"{option} expects SERVICE=VALUE with SERVICE in "
+                f"{', '.join(SERVICES)}, got {value!r}")
+        parsed[service] = setting
+    return parsed
+
+
+def build_profiles(latencies: List[str],
+                   error_rates: List[str]) -> Dict[str, ServiceProfile]:
+    profiles = {service: ServiceProfile() for service in SERVICES}
+    for service, setting in parse_service_values(latencies,
+                                                 "--latency").items():
+        median, _, sigma = setting.partition(":")
+        profiles[service].median = float(median)
+        profiles[service].sigma = float(sigma or 0.0)
+    for service, setting in parse_service_values(error_rates,
+                                                 "--error-rate").items():
+        profiles[service].error_rate = float(setting)
+    return profiles
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Serve fake OpenAI, Serper and GitHub APIs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument(
+        "--latency",
+        action="append",
+        default=[],
+        metavar="SERVICE=MEDIAN[:SIGMA]",
+        help="Log-normal latency in seconds, e.g. openai=1.5:0.4")
+    parser.add_argument("--error-rate",
+                        action="append",
+                        default=[],
+                        metavar="SERVICE=RATE",
+                        help="Fraction of requests that fail, e.g. "
+                        "openai=0.02 (OpenAI failures are 429s)")
+    parser.add_argument("--jsonld-rate",
+                        type=float,
+                        default=0.5,
+                        help="Fraction of job postings that carry "
+                        "schema.org JobPosting JSON-LD")
+    parser.add_argument("--github-quota",
+                        type=int,
+                        default=5000,
+                        help="GitHub core requests allowed per hour")
+    parser.add_argument("--tokens-per-second",
+                        type=float,
+                        default=0.0,
+                        help="Simulated output-token generation speed for "
+                        "OpenAI completions (0 returns them instantly)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    services = FakeServices(build_profiles(args.latency, args.error_rate),
+                            jsonld_rate=args.jsonld_rate,
+                            github_quota=args.github_quota,
+                            tokens_per_second=args.tokens_per_second)
+    web.run_app(services.build_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
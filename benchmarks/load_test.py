@@ -0,0 +1,333 @@
+"""
+Load driver for POST /customize-resume.
+
+Sends `--requests` resume requests, at most `--concurrency` at a time, and
+reports throughput, latency percentiles and per-stage timings taken from
+the server's /metrics before and after the run. With --baseline it exits
+non-zero when throughput or tail latency regress by more than
+--max-regression.
+
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 \
+        --requests 200 --concurrency 16 --fake-url http://127.0.0.1:8900
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+import aiohttp
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+_SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)$')
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+Sample = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def parse_metrics(text: str) -> Dict[Sample, float]:
+    samples = {}
+    for line in text.splitlines():
+        match = _SAMPLE.match(line)
+        if not match:
+            continue
+        name, labels, value = match.groups()
+        samples[(name, tuple(sorted(_LABEL.findall(labels or ""))))] = float(
+            value)
+    return samples
+
+
+def metrics_delta(before: Dict[Sample, float],
+                  after: Dict[Sample, float]) -> Dict[Sample, float]:
+    return {
+        sample: value - before.get(sample, 0.0)
+        for sample, value in after.items()
+    }
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def histogram_quantile(buckets: Dict[float, float], fraction: float) -> float:
+    """
+    Upper bound of the bucket holding the requested quantile, as
+    Prometheus' histogram_quantile would report without interpolation.
+    """
+    total = buckets.get(float("inf"), 0.0)
+    if total <= 0:
+        return 0.0
+    for bound in sorted(buckets):
+        if buckets[bound] >= fraction * total:
+            return bound
+    return float("inf")
+
+
+def histogram_summary(delta: Dict[Sample, float], metric: str,
+                      group_by: List[str]) -> Dict[str, Dict[str, float]]:
+    """
+    Count, mean and bucketed p50/p95 per label combination of a histogram,
+    from the difference between two /metrics scrapes.
+    """
+    counts: Dict[str, float] = defaultdict(float)
+    sums: Dict[str, float] = defaultdict(float)
+    buckets: Dict[str, Dict[float, float]] = defaultdict(
+        lambda: defaultdict(float))
+    for (name, labels), value in delta.items():
+        label_map = dict(labels)
+        key = "/".join(label_map.get(label, "") for label in group_by)
+        if name == f"{metric}_count":
+            counts[key] += value
+        elif name == f"{metric}_sum":
+            sums[key] += value
+        elif name == f"{metric}_bucket":
+            bound = label_map.get("le", "+Inf")
+            buckets[key][float("inf") if bound == "+Inf" else float(bound)] += (
+                value)
+    return {
+        key: {
+            "count": count,
+            "mean": sums[key] / count,
+            "p50": histogram_quantile(buckets[key], 0.50),
+            "p95": histogram_quantile(buckets[key], 0.95),
+        }
+        for key, count in sorted(counts.items()) if count > 0
+    }
+
+
+def counter_summary(delta: Dict[Sample, float], metric: str,
+                    group_by: List[str]) -> Dict[str, float]:
+    totals: Dict[str, float] = defaultdict(float)
+    for (name, labels), value in delta.items():
+        if name == metric and value:
+            label_map = dict(labels)
+            totals["/".join(label_map.get(label, "")
+                            for label in group_by)] += value
+    return dict(sorted(totals.items()))
+
+
+class LoadTest:
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        with open(args.resume, "rb") as file:
+            self.resume = file.read()
+        self.latencies: List[float] = []
+        self.statuses: Dict[str, int] = defaultdict(int)
+
+    async def fetch_json(self, session: aiohttp.ClientSession,
+                         url: str) -> Optional[Dict[str, Any]]:
+        try:
+            async with session.get(url) as response:
+                return await response.json()
+        except (aiohttp.ClientError, ValueError):
+            return None
+
+    async def scrape_metrics(
+            self, session: aiohttp.ClientSession) -> Dict[Sample, float]:
+        async with session.get(f"{self.args.url}/metrics") as response:
+            return parse_metrics(await response.text())
+
+    async def send(self, session: aiohttp.ClientSession, index: int) -> None:
+        form = aiohttp.FormData()
+        form.add_field("job_url", self.args.job_url.format(i=index))
+        form.add_field("linkedin_url", self.args.linkedin_url)
+        if self.args.github_url:
+            form.add_field("github_url", self.args.github_url)
+        form.add_field("resume_file",
+                       self.resume,
+                       filename=f"resume-{index}.md",
+                       content_type="text/markdown")
+        started = time.perf_counter()
+        try:
+            async with session.post(f"{self.args.url}/customize-resume",
+                                    data=form) as response:
+                await response.read()
+                status = str(response.status)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            status = type(e).__name__
+        self.statuses[status] += 1
+        if status == "200":
+            self.latencies.append(time.perf_counter() - started)
+
+    async def run(self) -> Dict[str, Any]:
+        timeout = aiohttp.ClientTimeout(total=self.args.timeout)
+        connector = aiohttp.TCPConnector(limit=self.args.concurrency)
+        async with aiohttp.ClientSession(timeout=timeout,
+                                         connector=connector) as session:
+            before = await self.scrape_metrics(session)
+            fake_before = (await self.fetch_json(
+                session, f"{self.args.fake_url}/_stats")
+                           if self.args.fake_url else None)
+
+            semaphore = asyncio.Semaphore(self.args.concurrency)
+
+            async def bounded(index: int) -> None:
+                async with semaphore:
+                    await self.send(session, index)
+
+            started = time.perf_counter()
+            await asyncio.gather(
+                *(bounded(index) for index in range(self.args.requests)))
+            elapsed = time.perf_counter() - started
+
+            delta = metrics_delta(before, await self.scrape_metrics(session))
+            fake_after = (await self.fetch_json(
+                session, f"{self.args.fake_url}/_stats")
+                          if self.args.fake_url else None)
+
+        report = {
+            "requests": self.args.requests,
+            "concurrency": self.args.concurrency,
+            "elapsed_seconds": elapsed,
+            "statuses": dict(self.statuses),
+            "throughput_rps": len(self.latencies) / elapsed,
+            "latency_seconds": {
+                "mean": (sum(self.latencies) / len(self.latencies)
+                         if self.latencies else 0.0),
+                "p50": percentile(self.latencies, 0.50),
+                "p95": percentile(self.latencies, 0.95),
+                "p99": percentile(self.latencies, 0.99),
+                "max": max(self.latencies, default=0.0),
+            },
+            "stages":
+            histogram_summary(delta,
+                              "grosbeak_pipeline_stage_duration_seconds",
+                              ["stage"]),
+            "llm_calls":
+            histogram_summary(delta, "grosbeak_llm_call_duration_seconds",
+                              ["stage", "model"]),
+            "llm_tokens":
+            counter_summary(delta, "grosbeak_llm_tokens_total", ["kind"]),
+            "pipeline_errors":
+            counter_summary(delta, "grosbeak_pipeline_errors_total",
+                            ["stage"]),
+            "cache":
+            counter_summary(delta, "grosbeak_cache_requests_total",
+                            ["cache", "result"]),
+            "job_extractions":
+            counter_summary(delta, "grosbeak_job_extractions_total",
+                            ["path"]),
+            "github_requests":
+            counter_summary(delta, "grosbeak_github_requests_total",
+                            ["resource", "result"]),
+        }
+        extractions = sum(report["job_extractions"].values())
+        if extractions:
+            report["job_extractions_without_llm"] = (
+                report["job_extractions"].get("rules", 0.0) +
+                report["job_extractions"].get("cached", 0.0)) / extractions
+        if fake_before is not None and fake_after is not None:
+            report["upstream_requests"] = {
+                service: count -
+                fake_before.get("requests", {}).get(service, 0)
+                for service, count in fake_after.get("requests", {}).items()
+            }
+        return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    latency = report["latency_seconds"]
+    print(f"Requests:    {report['requests']} at concurrency "
+          f"{report['concurrency']} in {report['elapsed_seconds']:.2f}s")
+    print(f"Statuses:    {report['statuses']}")
+    print(f"Throughput:  {report['throughput_rps']:.2f} req/s")
+    print(f"Latency:     p50 {latency['p50']:.3f}s  p95 {latency['p95']:.3f}s"
+          f"  p99 {latency['p99']:.3f}s  max {latency['max']:.3f}s")
+    for title, key in (("Pipeline stages", "stages"), ("LLM calls",
+                                                       "llm_calls")):
+        if not report[key]:
+            continue
+        print(f"\n{title}:")
+        width = max(len(name) for name in report[key])
+        for name, stats in report[key].items():
+            print(f"  {name:<{width}}  n={stats['count']:<6.0f} "
+                  f"mean {stats['mean']:.3f}s  p50<={stats['p50']}s  "
+                  f"p95<={stats['p95']}s")
+    for title, key in (("LLM tokens", "llm_tokens"),
+                       ("Pipeline errors", "pipeline_errors"),
+                       ("Cache", "cache"), ("Job extractions",
+                                            "job_extractions"),
+                       ("GitHub requests", "github_requests"),
+                       ("Upstream requests", "upstream_requests")):
+        if report.get(key):
+            print(f"\n{title}: " + ", ".join(
+                f"{name}={value:.0f}" for name, value in report[key].items()))
+    if "job_extractions_without_llm" in report:
+        print("Job postings parsed without an LLM call: "
+              f"{report['job_extractions_without_llm']:.0%}")
+
+
+def find_regressions(report: Dict[str, Any], baseline: Dict[str, Any],
+                     max_regression: float) -> List[str]:
+    regressions = []
+    if report["throughput_rps"] < baseline["throughput_rps"] * (
+            1 - max_regression):
+        regressions.append(
+            f"throughput {report['throughput_rps']:.2f} req/s vs baseline "
+            f"{baseline['throughput_rps']:.2f} req/s")
+    for quantile in ("p95", "p99"):
+        current = report["latency_seconds"][quantile]
+        previous = baseline["latency_seconds"][quantile]
+        if current > previous * (1 + max_regression):
+            regressions.append(f"{quantile} latency {current:.3f}s vs "
+                               f"baseline {previous:.3f}s")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Load test POST /customize-resume")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument(
+        "--job-url",
+        default="https://jobs.example.com/postings/{i}",
+        help="Job URL template; {i} is replaced with the request number")
+    parser.add_argument("--linkedin-url",
+                        default="https://www.linkedin.com/in/johndoe")
+    parser.add_argument("--github-url", default="https://github.com/johndoe")
+    parser.add_argument("--resume",
+                        default=os.path.join(FIXTURES_DIR, "resume.md"))
+    parser.add_argument("--fake-url",
+                        default=None,
+                        help="Base URL of benchmarks.fake_services, to "
+                        "report upstream request counts")
+    parser.add_argument("--output", help="Write the report as JSON")
+    parser.add_argument("--baseline",
+                        help="JSON report of a previous run to compare to")
+    parser.add_argument("--max-regression",
+                        type=float,
+                        default=0.10,
+                        help="Allowed fractional regression vs --baseline")
+    args = parser.parse_args()
+
+    report = asyncio.run(LoadTest(args).run())
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = find_regressions(report, json.load(file),
+                                           args.max_regression)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 from src.agents.resume_agent import ResumeAgent
+from src.services.model_router import AGGREGATOR
 
 
 class AggregatorAgent(ResumeAgent):
     name: str = "AggregatorAgent"
     description: str = "Agent that combines and refines resumes from other agents"
+    stage: str = AGGREGATOR
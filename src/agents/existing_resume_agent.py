@@ -1,4 +1,5 @@
 from src.agents.resume_agent import ResumeAgent
+from src.services.model_router import EXISTING_RESUME_AGENT
 
 
 class ExistingResumeAgent(ResumeAgent):
@@ -6,3 +7,4 @@ class ExistingResumeAgent(ResumeAgent):
     description: str = (
         "Agent that creates a resume based on the user's existing resume and job description"
     )
+    stage: str = EXISTING_RESUME_AGENT
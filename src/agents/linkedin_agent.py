@@ -1,4 +1,5 @@
 from src.agents.resume_agent import ResumeAgent
+from src.services.model_router import LINKEDIN_AGENT
 
 
 class LinkedInAgent(ResumeAgent):
@@ -6,3 +7,4 @@ class LinkedInAgent(ResumeAgent):
     description: str = (
         "Agent that creates a resume based on LinkedIn profile and job description"
     )
+    stage: str = LINKEDIN_AGENT
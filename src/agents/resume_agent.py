@@ -1,6 +1,8 @@
+from typing import Optional
 from pydantic import BaseModel
 
 
 class ResumeAgent(BaseModel):
     name: str
     description: str
+    stage: Optional[str] = None
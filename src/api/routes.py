@@ -1,11 +1,16 @@
 from fastapi import APIRouter, File, Form, UploadFile, HTTPException, Request
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import (HTMLResponse, PlainTextResponse, Response,
+                               StreamingResponse)
 from fastapi.templating import Jinja2Templates
 import aiofiles
+import json
 import os
-from src.orchestrator import Orchestrator
-from src.config import get_settings
+from src.config import (get_job_queue, get_orchestrator, get_result_store,
+                        get_settings)
 from src.models.resume import ResumeContent
+from src.services.job_queue import SUCCEEDED
+from src.utils.metrics import REGISTRY
+from typing import Any
 import uuid
 import logfire
 
@@ -13,11 +18,21 @@ router = APIRouter()
 settings = get_settings()
 templates = Jinja2Templates(directory="templates")
 
-orchestrator = Orchestrator(settings.get_llm_client(), settings.SERPER_API_KEY,
-                            settings.GITHUB_API_KEY)
+orchestrator = get_orchestrator()
+job_queue = get_job_queue()
+result_store = get_result_store()
 
-# Dictionary to store generated resumes
-generated_resumes = {}
+
+async def save_upload(resume_file: UploadFile) -> str:
+    file_path = os.path.join(settings.UPLOAD_DIR, resume_file.filename)
+    async with aiofiles.open(file_path, 'wb') as out_file:
+        content = await resume_file.read()
+        await out_file.write(content)
+    return file_path
+
+
+def format_sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 
 @router.post("/customize-resume", response_class=HTMLResponse)
@@ -25,17 +40,16 @@ async def customize_resume(request: Request,
                            job_url: str = Form(...),
                            linkedin_url: str = Form(...),
                            github_url: str = Form(None),
+                           bypass_cache: bool = Form(False),
                            resume_file: UploadFile = File(...)):
     try:
         # Save the uploaded file
-        file_path = os.path.join(settings.UPLOAD_DIR, resume_file.filename)
-        async with aiofiles.open(file_path, 'wb') as out_file:
-            content = await resume_file.read()
-            await out_file.write(content)
+        file_path = await save_upload(resume_file)
 
         # Process the resume
         customized_resume: ResumeContent = await orchestrator.process_resume_request(
-            job_url, linkedin_url, file_path, github_url)
+            job_url, linkedin_url, file_path, github_url,
+            bypass_cache=bypass_cache)
 
         # Clean up the uploaded file
         os.remove(file_path)
@@ -44,7 +58,7 @@ async def customize_resume(request: Request,
         resume_id = str(uuid.uuid4())
 
         # Store the generated resume
-        generated_resumes[resume_id] = customized_resume
+        await result_store.put(resume_id, customized_resume)
 
         # Render the result template
         return templates.TemplateResponse(
@@ -63,22 +77,172 @@ async def customize_resume(request: Request,
                                           status_code=500)
 
 
+@router.post("/customize-resume/stream")
+async def customize_resume_stream(job_url: str = Form(...),
+                                  linkedin_url: str = Form(...),
+                                  github_url: str = Form(None),
+                                  bypass_cache: bool = Form(False),
+                                  resume_file: UploadFile = File(...)):
+    file_path = await save_upload(resume_file)
+
+    async def event_stream():
+        chunks = []
+        try:
+            yield format_sse("status", "Gathering job and candidate details")
+            async for token in orchestrator.stream_resume_request(
+                    job_url,
+                    linkedin_url,
+                    file_path,
+                    github_url,
+                    bypass_cache=bypass_cache):
+                chunks.append(token)
+                yield format_sse("token", token)
+
+            # Store the finished resume once the stream completes
+            resume_id = str(uuid.uuid4())
+            await result_store.put(resume_id, ResumeContent("".join(chunks)))
+            yield format_sse("done", resume_id)
+        except Exception as e:
+            logfire.error("Error during streamed resume customization",
+                          error=str(e))
+            yield format_sse("error", str(e))
+        finally:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+    return StreamingResponse(event_stream(),
+                             media_type="text/event-stream",
+                             headers={
+                                 "Cache-Control": "no-cache",
+                                 "X-Accel-Buffering": "no"
+                             })
+
+
+@router.post("/customize-resume/batch")
+async def customize_resume_batch(job_urls: str = Form(...),
+                                 linkedin_url: str = Form(...),
+                                 github_url: str = Form(None),
+                                 resume_file: UploadFile = File(...)):
+    urls = [url.strip() for url in job_urls.splitlines() if url.strip()]
+    if not urls:
+        raise HTTPException(status_code=400, detail="No job URLs provided")
+    if len(urls) > settings.BATCH_MAX_JOBS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.BATCH_MAX_JOBS} job URLs per batch")
+
+    file_path = await save_upload(resume_file)
+
+    async def event_stream():
+        try:
+            async for job_url, result in orchestrator.process_batch_request(
+                    urls,
+                    linkedin_url,
+                    file_path,
+                    github_url,
+                    concurrency=settings.BATCH_CONCURRENCY):
+                if isinstance(result, Exception):
+                    yield format_sse("failed", {
+                        "job_url": job_url,
+                        "error": str(result)
+                    })
+                    continue
+                resume_id = str(uuid.uuid4())
+                await result_store.put(resume_id, result)
+                yield format_sse("result", {
+                    "job_url": job_url,
+                    "resume_id": resume_id
+                })
+            yield format_sse("done", {"total": len(urls)})
+        except Exception as e:
+            logfire.error("Error during batch resume customization",
+                          error=str(e))
+            yield format_sse("error", str(e))
+        finally:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+    return StreamingResponse(event_stream(),
+                             media_type="text/event-stream",
+                             headers={
+                                 "Cache-Control": "no-cache",
+                                 "X-Accel-Buffering": "no"
+                             })
+
+
+@router.post("/jobs", status_code=202)
+async def submit_job(job_url: str = Form(...),
+                     linkedin_url: str = Form(...),
+                     github_url: str = Form(None),
+                     bypass_cache: bool = Form(False),
+                     resume_file: UploadFile = File(...)):
+    content = await resume_file.read()
+    job_id = await job_queue.enqueue({
+        "job_url": job_url,
+        "linkedin_url": linkedin_url,
+        "github_url": github_url,
+        "bypass_cache": bypass_cache,
+        "resume_filename": resume_file.filename,
+        "resume_text": content.decode("utf-8", errors="replace"),
+    })
+    logfire.info("Queued resume job", job_id=job_id)
+    return {"job_id": job_id, "status_url": f"/jobs/{job_id}"}
+
+
+@router.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    response = {
+        "job_id": job.id,
+        "status": job.status,
+        "attempts": job.attempts,
+        "error": job.error,
+    }
+    if job.status == SUCCEEDED:
+        response["resume_markdown"] = job.result
+        response["download_url"] = f"/download-resume/{job.id}"
+    return response
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    If-None-Match uses weak comparison (RFC 9110 13.1.2): a W/ prefix is
+    ignored, and "*" matches any existing resource.
+    """
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
 @router.get("/download-resume/{resume_id}")
-async def download_resume(resume_id: str):
-    if resume_id not in generated_resumes:
+async def download_resume(resume_id: str, request: Request):
+    stored = await result_store.get(resume_id)
+    if stored is None:
         raise HTTPException(status_code=404, detail="Resume not found")
 
-    resume_content = generated_resumes[resume_id]
+    headers = {
+        "ETag": stored.etag,
+        "Cache-Control": "private, no-cache",
+    }
+    if etag_matches(request.headers.get("if-none-match", ""), stored.etag):
+        return Response(status_code=304, headers=headers)
+
+    headers["Content-Disposition"] = (
+        'attachment; filename="customized_resume.md"')
+    return Response(stored.content.markdown_content,
+                    media_type="text/markdown",
+                    headers=headers)
 
-    # Create a temporary file
-    temp_file_path = f"/tmp/{resume_id}.md"
-    with open(temp_file_path, "w") as f:
-        f.write(resume_content.markdown_content)
 
-    # Serve the file
-    return FileResponse(temp_file_path,
-                        media_type="text/markdown",
-                        filename="customized_resume.md")
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(),
+                             media_type="text/plain; version=0.0.4")
 
 
 @router.get("/", response_class=HTMLResponse)
@@ -3,41 +3,389 @@ from pydantic import Field
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 from openai import AsyncOpenAI
+import httpx
 import instructor
+from typing import Dict, List, Optional
+from src.orchestrator import Orchestrator
+from src.services.job_queue import JobQueue
+from src.services.llm_gateway import LLMGateway
+from src.services.github_scraper import GITHUB_API_URL
+from src.services.github_rate_limiter import GithubRateLimiter
+from src.services.http_client import HttpClient
+from src.services.result_store import ResultStore
+from src.services.parse_cache import ParseCache
+from src.services.scrape_cache import ScrapeCache
+from src.services.llm_scheduler import LLMScheduler
+from src.services.model_router import (AGGREGATOR, EXISTING_RESUME_AGENT,
+                                       JOB_PARSE, LINKEDIN_AGENT,
+                                       LINKEDIN_PARSE, ModelRoute,
+                                       ModelRouter)
+from src.services.web_scraper import SERPER_SCRAPE_URL
+from src.services.web_searcher import SERPER_SEARCH_URL, WebSearcher
+from src.utils.tiered_cache import TieredCache, open_tiered_cache
 
 
 class Settings(BaseSettings):
     # OpenAI Configuration
     OPENAI_API_KEY: str = Field(..., env="OPENAI_API_KEY")
     OPENAI_MODEL: str = Field("gpt-4o", env="OPENAI_MODEL")
+    # Override to point at a proxy or the benchmark stand-ins
+    OPENAI_BASE_URL: Optional[str] = Field(None, env="OPENAI_BASE_URL")
+    # Fast model for structured extraction of job postings and profiles
+    OPENAI_PARSE_MODEL: str = Field("gpt-4o-mini", env="OPENAI_PARSE_MODEL")
+    OPENAI_FALLBACK_MODEL: str = Field("gpt-4o-mini",
+                                       env="OPENAI_FALLBACK_MODEL")
+    PARSE_LATENCY_SLO_SECONDS: float = Field(
+        20.0, env="PARSE_LATENCY_SLO_SECONDS")
+    GENERATION_LATENCY_SLO_SECONDS: float = Field(
+        90.0, env="GENERATION_LATENCY_SLO_SECONDS")
+    # Per-stage overrides, e.g. {"aggregator": {"model": "gpt-4o"}}
+    MODEL_ROUTES: Dict[str, ModelRoute] = Field(default_factory=dict,
+                                                env="MODEL_ROUTES")
+
+    # Prompt Context Configuration
+    # Token budget for the job, LinkedIn and GitHub context in each agent
+    # prompt; the least relevant positions, skills, projects and repos are
+    # dropped to fit. Per-stage overrides, e.g. {"aggregator": 8000}
+    PROMPT_CONTEXT_TOKENS: int = Field(6000, env="PROMPT_CONTEXT_TOKENS")
+    PROMPT_CONTEXT_BUDGETS: Dict[str, int] = Field(
+        default_factory=dict, env="PROMPT_CONTEXT_BUDGETS")
+
+    # Agent stages that write their resume as an outline followed by
+    # concurrent per-section calls, e.g. ["linkedin_agent", "aggregator"]
+    SECTIONED_GENERATION_STAGES: List[str] = Field(
+        default_factory=list, env="SECTIONED_GENERATION_STAGES")
+
+    # LLM Rate Limiting Configuration
+    LLM_REQUESTS_PER_MINUTE: int = Field(500, env="LLM_REQUESTS_PER_MINUTE")
+    LLM_TOKENS_PER_MINUTE: int = Field(300000, env="LLM_TOKENS_PER_MINUTE")
+    LLM_MAX_CONCURRENCY: int = Field(16, env="LLM_MAX_CONCURRENCY")
+    LLM_MAX_RETRIES: int = Field(5, env="LLM_MAX_RETRIES")
+    LLM_EXPECTED_COMPLETION_TOKENS: int = Field(
+        1500, env="LLM_EXPECTED_COMPLETION_TOKENS")
+
+    # LLM Tail Latency Configuration
+    LLM_HEDGE_DELAY_SECONDS: Optional[float] = Field(
+        None, env="LLM_HEDGE_DELAY_SECONDS")
+    LLM_DEADLINE_SECONDS: Optional[float] = Field(180.0,
+                                                  env="LLM_DEADLINE_SECONDS")
 
     # Serper API Configuration
     SERPER_API_KEY: str = Field(..., env="SERPER_API_KEY")
+    SERPER_SCRAPE_URL: str = Field(SERPER_SCRAPE_URL, env="SERPER_SCRAPE_URL")
+    SERPER_SEARCH_URL: str = Field(SERPER_SEARCH_URL, env="SERPER_SEARCH_URL")
+    # Queries per batched search request; 1 sends one request per query
+    SEARCH_BATCH_SIZE: int = Field(100, env="SEARCH_BATCH_SIZE")
+    SEARCH_MAX_CONCURRENCY: int = Field(4, env="SEARCH_MAX_CONCURRENCY")
+    SEARCH_CACHE_ENABLED: bool = Field(True, env="SEARCH_CACHE_ENABLED")
+    SEARCH_CACHE_TTL_SECONDS: int = Field(86400,
+                                          env="SEARCH_CACHE_TTL_SECONDS")
+    SEARCH_CACHE_MAX_ENTRIES: int = Field(512, env="SEARCH_CACHE_MAX_ENTRIES")
+    SEARCH_CACHE_MAX_DISK_ENTRIES: int = Field(
+        20000, env="SEARCH_CACHE_MAX_DISK_ENTRIES")
 
     # GitHub API Configuration
     GITHUB_API_KEY: str = Field(..., env="GITHUB_API_KEY")
+    GITHUB_API_URL: str = Field(GITHUB_API_URL, env="GITHUB_API_URL")
+    # When set, agents start without GitHub data if it is not ready within
+    # GITHUB_OPTIONAL_TIMEOUT_SECONDS of their other inputs
+    GITHUB_OPTIONAL: bool = Field(False, env="GITHUB_OPTIONAL")
+    GITHUB_OPTIONAL_TIMEOUT_SECONDS: float = Field(
+        2.0, env="GITHUB_OPTIONAL_TIMEOUT_SECONDS")
+    # GitHub API requests in flight at once while fetching one profile
+    GITHUB_MAX_CONCURRENCY: int = Field(4, env="GITHUB_MAX_CONCURRENCY")
+    # Requests kept back from each rate-limit window, capped at a fraction
+    # of the window's limit; once fewer remain, requests wait for the reset
+    GITHUB_RATE_LIMIT_RESERVE: int = Field(50, env="GITHUB_RATE_LIMIT_RESERVE")
+    GITHUB_RATE_LIMIT_RESERVE_FRACTION: float = Field(
+        0.01, env="GITHUB_RATE_LIMIT_RESERVE_FRACTION")
+    # Fraction of the window below which requests are spread out evenly
+    # over the time left until the reset
+    GITHUB_RATE_LIMIT_PACE_BELOW: float = Field(
+        0.2, env="GITHUB_RATE_LIMIT_PACE_BELOW")
+    GITHUB_RATE_LIMIT_MAX_WAIT_SECONDS: float = Field(
+        30.0, env="GITHUB_RATE_LIMIT_MAX_WAIT_SECONDS")
+    # Language stats are aggregated over the most recently pushed repos
+    GITHUB_LANGUAGES_ENABLED: bool = Field(True,
+                                           env="GITHUB_LANGUAGES_ENABLED")
+    GITHUB_LANGUAGES_MAX_REPOS: int = Field(50,
+                                            env="GITHUB_LANGUAGES_MAX_REPOS")
+    # Cached GitHub responses, revalidated with ETag/Last-Modified
+    GITHUB_CACHE_ENABLED: bool = Field(True, env="GITHUB_CACHE_ENABLED")
+    GITHUB_CACHE_TTL_SECONDS: int = Field(30 * 86400,
+                                          env="GITHUB_CACHE_TTL_SECONDS")
+    GITHUB_CACHE_MAX_ENTRIES: int = Field(1024, env="GITHUB_CACHE_MAX_ENTRIES")
+    GITHUB_CACHE_MAX_DISK_ENTRIES: int = Field(
+        50000, env="GITHUB_CACHE_MAX_DISK_ENTRIES")
+
+    # Outbound HTTP Configuration (shared by the Serper and GitHub scrapers)
+    HTTP_MAX_CONNECTIONS: int = Field(100, env="HTTP_MAX_CONNECTIONS")
+    HTTP_MAX_CONNECTIONS_PER_HOST: int = Field(
+        20, env="HTTP_MAX_CONNECTIONS_PER_HOST")
+    HTTP_DNS_CACHE_SECONDS: int = Field(300, env="HTTP_DNS_CACHE_SECONDS")
+    HTTP_KEEPALIVE_SECONDS: float = Field(30.0, env="HTTP_KEEPALIVE_SECONDS")
+    HTTP_TIMEOUT_SECONDS: float = Field(60.0, env="HTTP_TIMEOUT_SECONDS")
+    # Connections opened per upstream host at startup; 0 disables warm-up
+    HTTP_WARMUP_CONNECTIONS: int = Field(2, env="HTTP_WARMUP_CONNECTIONS")
 
     # Application Configuration
     DEBUG: bool = Field(False, env="DEBUG")
     LOGFIRE_TOKEN: str = Field(..., env="LOGFIRE_TOKEN")
 
+    # Batch Configuration
+    BATCH_CONCURRENCY: int = Field(4, env="BATCH_CONCURRENCY")
+    BATCH_MAX_JOBS: int = Field(200, env="BATCH_MAX_JOBS")
+
+    # Scrape Cache Configuration
+    SCRAPE_CACHE_ENABLED: bool = Field(True, env="SCRAPE_CACHE_ENABLED")
+    SCRAPE_CACHE_JOB_TTL_SECONDS: int = Field(
+        6 * 3600, env="SCRAPE_CACHE_JOB_TTL_SECONDS")
+    SCRAPE_CACHE_LINKEDIN_TTL_SECONDS: int = Field(
+        24 * 3600, env="SCRAPE_CACHE_LINKEDIN_TTL_SECONDS")
+    # How long past its TTL a page may still be served while it is
+    # refreshed in the background
+    SCRAPE_CACHE_STALE_SECONDS: int = Field(3 * 86400,
+                                            env="SCRAPE_CACHE_STALE_SECONDS")
+    SCRAPE_CACHE_MAX_ENTRIES: int = Field(512, env="SCRAPE_CACHE_MAX_ENTRIES")
+    SCRAPE_CACHE_MAX_DISK_ENTRIES: int = Field(
+        20000, env="SCRAPE_CACHE_MAX_DISK_ENTRIES")
+
+    # Parsed Model Cache Configuration
+    PARSE_CACHE_ENABLED: bool = Field(True, env="PARSE_CACHE_ENABLED")
+    PARSE_CACHE_TTL_SECONDS: int = Field(30 * 86400,
+                                         env="PARSE_CACHE_TTL_SECONDS")
+    PARSE_CACHE_MAX_ENTRIES: int = Field(512, env="PARSE_CACHE_MAX_ENTRIES")
+    PARSE_CACHE_MAX_DISK_ENTRIES: int = Field(
+        20000, env="PARSE_CACHE_MAX_DISK_ENTRIES")
+
+    # Generated Resume Storage Configuration
+    RESULT_TTL_SECONDS: int = Field(7 * 86400, env="RESULT_TTL_SECONDS")
+    RESULT_MAX_ENTRIES: int = Field(256, env="RESULT_MAX_ENTRIES")
+    RESULT_MAX_BYTES: int = Field(256 * 1024 * 1024, env="RESULT_MAX_BYTES")
+
+    # Background Job Configuration
+    JOB_QUEUE_PATH: str = Field("cache/jobs.sqlite3", env="JOB_QUEUE_PATH")
+    JOB_LEASE_SECONDS: float = Field(300.0, env="JOB_LEASE_SECONDS")
+    JOB_MAX_ATTEMPTS: int = Field(3, env="JOB_MAX_ATTEMPTS")
+    JOB_RETENTION_SECONDS: int = Field(7 * 86400,
+                                       env="JOB_RETENTION_SECONDS")
+    WORKER_CONCURRENCY: int = Field(2, env="WORKER_CONCURRENCY")
+
     # File Upload Configuration
     UPLOAD_DIR: str = Field("uploads", env="UPLOAD_DIR")
 
+    # Cache Configuration
+    CACHE_DB_PATH: str = Field("cache/grosbeak.sqlite3", env="CACHE_DB_PATH")
+    LLM_CACHE_ENABLED: bool = Field(True, env="LLM_CACHE_ENABLED")
+    LLM_CACHE_TTL_SECONDS: int = Field(86400, env="LLM_CACHE_TTL_SECONDS")
+    LLM_CACHE_MAX_ENTRIES: int = Field(256, env="LLM_CACHE_MAX_ENTRIES")
+    LLM_CACHE_MAX_DISK_ENTRIES: int = Field(10000,
+                                            env="LLM_CACHE_MAX_DISK_ENTRIES")
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
 
     def get_llm_client(self) -> AsyncOpenAI:
-        client = AsyncOpenAI(api_key=self.OPENAI_API_KEY)
+        # Retries are handled by the shared LLMScheduler, which also reads
+        # rate-limit headers off every response
+        http_client = httpx.AsyncClient(
+            event_hooks={"response": [get_llm_scheduler().on_response]})
+        client = AsyncOpenAI(api_key=self.OPENAI_API_KEY,
+                             base_url=self.OPENAI_BASE_URL,
+                             max_retries=0,
+                             http_client=http_client)
         return instructor.apatch(client)
 
+    def get_warmup_urls(self) -> List[str]:
+        return [self.SERPER_SCRAPE_URL, self.GITHUB_API_URL]
+
+    def get_model_router(self) -> ModelRouter:
+        parse_route = ModelRoute(
+            model=self.OPENAI_PARSE_MODEL,
+            fallback_model=self.OPENAI_MODEL,
+            latency_slo_seconds=self.PARSE_LATENCY_SLO_SECONDS)
+        generation_route = ModelRoute(
+            model=self.OPENAI_MODEL,
+            fallback_model=self.OPENAI_FALLBACK_MODEL,
+            latency_slo_seconds=self.GENERATION_LATENCY_SLO_SECONDS)
+        routes = {
+            JOB_PARSE: parse_route,
+            LINKEDIN_PARSE: parse_route,
+            EXISTING_RESUME_AGENT: generation_route,
+            LINKEDIN_AGENT: generation_route,
+            AGGREGATOR: generation_route,
+            **self.MODEL_ROUTES,
+        }
+        return ModelRouter(routes, default_route=generation_route)
+
+    def get_llm_cache(self) -> Optional[TieredCache]:
+        if not self.LLM_CACHE_ENABLED:
+            return None
+        return open_tiered_cache(
+            "llm_responses",
+            self.CACHE_DB_PATH,
+            max_entries=self.LLM_CACHE_MAX_ENTRIES,
+            ttl_seconds=self.LLM_CACHE_TTL_SECONDS,
+            backend_max_entries=self.LLM_CACHE_MAX_DISK_ENTRIES)
+
+    def get_scrape_cache(self) -> Optional[ScrapeCache]:
+        if not self.SCRAPE_CACHE_ENABLED:
+            return None
+        cache = open_tiered_cache(
+            "scrapes",
+            self.CACHE_DB_PATH,
+            max_entries=self.SCRAPE_CACHE_MAX_ENTRIES,
+            backend_max_entries=self.SCRAPE_CACHE_MAX_DISK_ENTRIES)
+        return ScrapeCache(cache,
+                           ttl_seconds={
+                               "job": self.SCRAPE_CACHE_JOB_TTL_SECONDS,
+                               "linkedin":
+                               self.SCRAPE_CACHE_LINKEDIN_TTL_SECONDS,
+                           },
+                           stale_seconds=self.SCRAPE_CACHE_STALE_SECONDS)
+
+    def get_github_cache(self) -> Optional[TieredCache]:
+        if not self.GITHUB_CACHE_ENABLED:
+            return None
+        return open_tiered_cache(
+            "github_responses",
+            self.CACHE_DB_PATH,
+            max_entries=self.GITHUB_CACHE_MAX_ENTRIES,
+            ttl_seconds=self.GITHUB_CACHE_TTL_SECONDS,
+            backend_max_entries=self.GITHUB_CACHE_MAX_DISK_ENTRIES)
+
+    def get_search_cache(self) -> Optional[TieredCache]:
+        if not self.SEARCH_CACHE_ENABLED:
+            return None
+        return open_tiered_cache(
+            "web_searches",
+            self.CACHE_DB_PATH,
+            max_entries=self.SEARCH_CACHE_MAX_ENTRIES,
+            ttl_seconds=self.SEARCH_CACHE_TTL_SECONDS,
+            backend_max_entries=self.SEARCH_CACHE_MAX_DISK_ENTRIES)
+
+    def get_parse_cache(self) -> Optional[ParseCache]:
+        if not self.PARSE_CACHE_ENABLED:
+            return None
+        return ParseCache(
+            open_tiered_cache(
+                "parsed_models",
+                self.CACHE_DB_PATH,
+                max_entries=self.PARSE_CACHE_MAX_ENTRIES,
+                ttl_seconds=self.PARSE_CACHE_TTL_SECONDS,
+                backend_max_entries=self.PARSE_CACHE_MAX_DISK_ENTRIES))
+
 
 @lru_cache()
 def get_settings() -> Settings:
     return Settings()
 
 
+@lru_cache()
+def get_llm_scheduler() -> LLMScheduler:
+    settings = get_settings()
+    return LLMScheduler(
+        requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+        max_concurrency=settings.LLM_MAX_CONCURRENCY,
+        max_retries=settings.LLM_MAX_RETRIES)
+
+
+@lru_cache()
+def get_github_rate_limiter() -> GithubRateLimiter:
+    settings = get_settings()
+    return GithubRateLimiter(
+        reserve=settings.GITHUB_RATE_LIMIT_RESERVE,
+        reserve_fraction=settings.GITHUB_RATE_LIMIT_RESERVE_FRACTION,
+        pace_below=settings.GITHUB_RATE_LIMIT_PACE_BELOW,
+        max_wait_seconds=settings.GITHUB_RATE_LIMIT_MAX_WAIT_SECONDS)
+
+
+@lru_cache()
+def get_llm_gateway() -> LLMGateway:
+    settings = get_settings()
+    return LLMGateway(
+        settings.get_llm_client(),
+        cache=settings.get_llm_cache(),
+        scheduler=get_llm_scheduler(),
+        expected_completion_tokens=settings.LLM_EXPECTED_COMPLETION_TOKENS,
+        hedge_delay=settings.LLM_HEDGE_DELAY_SECONDS,
+        deadline=settings.LLM_DEADLINE_SECONDS,
+        router=settings.get_model_router())
+
+
+@lru_cache()
+def get_http_client() -> HttpClient:
+    settings = get_settings()
+    return HttpClient(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_connections_per_host=settings.HTTP_MAX_CONNECTIONS_PER_HOST,
+        dns_cache_seconds=settings.HTTP_DNS_CACHE_SECONDS,
+        keepalive_seconds=settings.HTTP_KEEPALIVE_SECONDS,
+        timeout_seconds=settings.HTTP_TIMEOUT_SECONDS)
+
+
+@lru_cache()
+def get_web_searcher() -> WebSearcher:
+    settings = get_settings()
+    return WebSearcher(settings.SERPER_API_KEY,
+                       base_url=settings.SERPER_SEARCH_URL,
+                       http_client=get_http_client(),
+                       cache=settings.get_search_cache(),
+                       batch=settings.SEARCH_BATCH_SIZE > 1,
+                       batch_size=settings.SEARCH_BATCH_SIZE,
+                       max_concurrency=settings.SEARCH_MAX_CONCURRENCY)
+
+
+@lru_cache()
+def get_orchestrator() -> Orchestrator:
+    settings = get_settings()
+    llm_gateway = get_llm_gateway()
+    return Orchestrator(
+        llm_gateway.llm_client,
+        settings.SERPER_API_KEY,
+        settings.GITHUB_API_KEY,
+        llm_gateway=llm_gateway,
+        github_optional_timeout=(settings.GITHUB_OPTIONAL_TIMEOUT_SECONDS
+                                 if settings.GITHUB_OPTIONAL else None),
+        context_budgets=settings.PROMPT_CONTEXT_BUDGETS,
+        default_context_budget=settings.PROMPT_CONTEXT_TOKENS,
+        serper_scrape_url=settings.SERPER_SCRAPE_URL,
+        github_api_url=settings.GITHUB_API_URL,
+        http_client=get_http_client(),
+        scrape_cache=settings.get_scrape_cache(),
+        parse_cache=settings.get_parse_cache(),
+        github_max_concurrency=settings.GITHUB_MAX_CONCURRENCY,
+        github_rate_limiter=get_github_rate_limiter(),
+        github_cache=settings.get_github_cache(),
+        github_languages_max_repos=(settings.GITHUB_LANGUAGES_MAX_REPOS
+                                    if settings.GITHUB_LANGUAGES_ENABLED else
+                                    None),
+        sectioned_stages=settings.SECTIONED_GENERATION_STAGES)
+
+
+@lru_cache()
+def get_job_queue() -> JobQueue:
+    settings = get_settings()
+    return JobQueue(settings.JOB_QUEUE_PATH,
+                    lease_seconds=settings.JOB_LEASE_SECONDS,
+                    max_attempts=settings.JOB_MAX_ATTEMPTS,
+                    retention_seconds=settings.JOB_RETENTION_SECONDS)
+
+
+@lru_cache()
+def get_result_store() -> ResultStore:
+    settings = get_settings()
+    return ResultStore(
+        open_tiered_cache("generated_resumes",
+                          settings.CACHE_DB_PATH,
+                          max_entries=settings.RESULT_MAX_ENTRIES,
+                          ttl_seconds=settings.RESULT_TTL_SECONDS,
+                          max_bytes=settings.RESULT_MAX_BYTES,
+                          evict_every=1))
+
+
 # Function to load configuration
 def load_config():
     return get_settings()
@@ -1,15 +1,84 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from fastapi.templating import Jinja2Templates
 from src.api.routes import router
-from src.config import get_settings
+from src.config import get_http_client, get_settings
+from src.utils.metrics import REQUESTS_IN_FLIGHT
 import logfire
 
-app = FastAPI()
 settings = get_settings()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled HTTP client for all scrapers, opened before the first
+    # request and closed on shutdown
+    http_client = get_http_client()
+    http_client.open()
+    if settings.HTTP_WARMUP_CONNECTIONS > 0:
+        await http_client.warm_up(settings.get_warmup_urls(),
+                                  settings.HTTP_WARMUP_CONNECTIONS)
+    try:
+        yield
+    finally:
+        await http_client.close()
+
+
+app = FastAPI(lifespan=lifespan)
 logfire.configure(pydantic_plugin=logfire.PydanticPlugin(record='all'))
 logfire.instrument_fastapi(app)
 logfire.instrument_aiohttp_client()
 
+
+def route_label(scope) -> str:
+    # Label by route template rather than raw path to keep label sets small
+    return next((getattr(route, "path", "other")
+                 for route in app.router.routes
+                 if route.matches(scope)[0] == Match.FULL), "other")
+
+
+class RequestsInFlightMiddleware:
+    """
+    Counts requests until their response body has been sent, so streamed
+    responses (/customize-resume/stream and /batch) stay in flight for as
+    long as they are producing output.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive,
+                       send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+        route = route_label(scope)
+        finished = False
+
+        def finish() -> None:
+            nonlocal finished
+            if not finished:
+                finished = True
+                REQUESTS_IN_FLIGHT.dec(path=route)
+
+        async def send_and_track(message: Message) -> None:
+            await send(message)
+            if (message["type"] == "http.response.body"
+                    and not message.get("more_body", False)):
+                finish()
+
+        REQUESTS_IN_FLIGHT.inc(path=route)
+        try:
+            await self.app(scope, receive, send_and_track)
+        finally:
+            # Errors and disconnects end the request without a final body
+            finish()
+
+
+app.add_middleware(RequestsInFlightMiddleware)
+
 # Include the router
 app.include_router(router)
 
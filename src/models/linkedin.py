@@ -1,49 +1,35 @@
-from typing import List, Optional, Union
-from pydantic import BaseModel, Field, field_validator
-from datetime import date
-from src.utils.flexible_date_parser import flexible_date_parser
+from typing import List, Optional
+from pydantic import BaseModel, Field, model_validator
+from src.utils.flexible_date_parser import (FlexibleDate, RecoveringDate,
+                                            count_lenient_dates)
+from src.utils.metrics import DATE_RETRIES_AVOIDED
 
 
 class Position(BaseModel):
     title: str
     company: str
     location: Optional[str] = None
-    start_date: Optional[Union[date, str]] = None
-    end_date: Optional[Union[date, str]] = None
+    start_date: FlexibleDate = None
+    end_date: FlexibleDate = None
     description: Optional[str] = None
 
-    @field_validator("start_date", "end_date", mode="before")
-    @classmethod
-    def parse_dates(cls, value):
-        return flexible_date_parser(value)
-
 
 class Education(BaseModel):
     school: str
     degree: Optional[str] = None
     field_of_study: Optional[str] = None
-    start_date: Optional[Union[date, str]] = None
-    end_date: Optional[Union[date, str]] = None
+    start_date: FlexibleDate = None
+    end_date: FlexibleDate = None
     description: Optional[str] = None
 
-    @field_validator("start_date", "end_date", mode="before")
-    @classmethod
-    def parse_dates(cls, value):
-        return flexible_date_parser(value)
-
 
 class Certification(BaseModel):
     name: str
     issuing_organization: str
-    issue_date: Optional[Union[date, str]] = None
-    expiration_date: Optional[Union[date, str]] = None
+    issue_date: FlexibleDate = None
+    expiration_date: FlexibleDate = None
     credential_id: Optional[str] = None
 
-    @field_validator("issue_date", "expiration_date", mode="before")
-    @classmethod
-    def parse_dates(cls, value):
-        return flexible_date_parser(value)
-
 
 class Skill(BaseModel):
     name: str
@@ -53,15 +39,15 @@ class Skill(BaseModel):
 class Project(BaseModel):
     name: str
     description: Optional[str] = None
-    start_date: Optional[date] = None
-    end_date: Optional[date] = None
+    start_date: RecoveringDate = None
+    end_date: RecoveringDate = None
     url: Optional[str] = None
 
 
 class Publication(BaseModel):
     title: str
     publisher: str
-    publication_date: Optional[date] = None
+    publication_date: RecoveringDate = None
     description: Optional[str] = None
     url: Optional[str] = None
 
@@ -69,8 +55,8 @@ class Publication(BaseModel):
 class VolunteerExperience(BaseModel):
     role: str
     organization: str
-    start_date: Optional[date] = None
-    end_date: Optional[date] = None
+    start_date: RecoveringDate = None
+    end_date: RecoveringDate = None
     description: Optional[str] = None
 
 
@@ -97,6 +83,15 @@ class LinkedInProfile(BaseModel):
     recommendations: Optional[int] = None
     connections: Optional[int] = None
 
+    @model_validator(mode="wrap")
+    @classmethod
+    def count_avoided_retries(cls, data, handler):
+        with count_lenient_dates() as lenient:
+            profile = handler(data)
+        if lenient:
+            DATE_RETRIES_AVOIDED.inc(model=cls.__name__)
+        return profile
+
     class Config:
         json_schema_extra = {
             "example": {
@@ -1,4 +1,6 @@
+from typing import List, Optional
 import markdown
+from pydantic import BaseModel, Field
 
 
 class ResumeContent:
@@ -9,3 +11,34 @@ class ResumeContent:
     @property
     def html_content(self) -> str:
         return markdown.markdown(self.markdown_content)
+
+
+class ResumeOutline(BaseModel):
+    """
+    Plan for a tailored resume. Each section is then written separately
+    from this plan, so it must say what every section covers.
+    """
+    candidate_name: str
+    contact_line: Optional[str] = Field(
+        None,
+        description="Location, email and profile links, separated by ' · '")
+    themes: List[str] = Field(
+        default_factory=list,
+        description="Job requirements the whole resume should reinforce")
+    summary: List[str] = Field(
+        default_factory=list,
+        description="Points for the summary, most relevant to the job first")
+    experience: List[str] = Field(
+        default_factory=list,
+        description="Positions to include, most relevant first, each with "
+        "title, company, dates and the achievements to highlight")
+    skills: List[str] = Field(
+        default_factory=list,
+        description="Skills to list, most relevant to the job first")
+    projects: List[str] = Field(
+        default_factory=list,
+        description="Projects or open-source work to include, with what to "
+        "highlight; empty if none are relevant")
+    education: List[str] = Field(
+        default_factory=list,
+        description="Degrees and certifications to include, with dates")
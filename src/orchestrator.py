@@ -1,59 +1,156 @@
 from openai import AsyncOpenAI
-from src.services.web_scraper import WebScraper
-from src.services.github_scraper import GithubScraper
+from src.services.web_scraper import SERPER_SCRAPE_URL, WebScraper
+from src.services.github_scraper import GITHUB_API_URL, GithubScraper
+from src.services.github_rate_limiter import GithubRateLimiter
+from src.services.http_client import HttpClient
+from src.services.parse_cache import ParseCache
+from src.services.scrape_cache import ScrapeCache
+from src.services.section_writer import SectionWriter
+from src.services.llm_gateway import LLMGateway
 import os
 import aiofiles
 import asyncio
-import json
 from src.agents.resume_agent import ResumeAgent
 from src.agents.linkedin_agent import LinkedInAgent
 from src.agents.existing_resume_agent import ExistingResumeAgent
 from src.agents.aggregator_agent import AggregatorAgent
 from src.models.resume import ResumeContent
-from typing import Any, Dict, Optional
-from src.utils.json_encoder import CustomJSONEncoder
+from typing import (Any, AsyncIterator, Collection, Dict, List, Optional,
+                    Tuple, Union)
+from src.utils.context_encoder import encode_for_prompt
+from src.utils.context_packer import (PackedContext, github_source,
+                                      linkedin_source, pack_context)
+from src.utils.metrics import (PIPELINE_ERRORS, PIPELINE_STAGE_SECONDS,
+                               PROMPT_CONTEXT_DROPPED)
+from src.utils.priority import Priority, llm_priority
+from src.utils.stage_graph import StageGraph
+from src.utils.tiered_cache import TieredCache
 import logfire
 
+# Candidate sources are encoded once per request (or once per candidate in
+# a batch) and packed into each agent's context budget per job
+CANDIDATE_INPUTS = ["linkedin_context", "existing_resume", "github_context"]
+AGGREGATOR_INPUTS = ["existing_resume_output", "linkedin_resume_output"]
+DEFAULT_CONTEXT_BUDGET = 6000
+
+# Every agent call starts with this system message followed by the shared
+# context message, so the provider can reuse the cached prompt prefix
+# across agents and, for batches, across job postings.
+SHARED_SYSTEM_PROMPT = (
+    "You are part of a resume tailoring pipeline. The next message holds "
+    "the candidate's LinkedIn profile and GitHub information, followed by "
+    "the target job description, as compact JSON. Treat it as the source "
+    "of truth for the task that follows it.")
+
+
+# Upstream statuses that mean the request itself was rejected, as opposed
+# to a transient failure worth retrying
+RETRYABLE_CLIENT_STATUSES = {408, 429}
+
+
+class InvalidRequestError(ValueError):
+    """
+    A resume request that cannot succeed as submitted: an unreadable
+    resume file, a missing URL, or a page the scraper rejected.
+    """
+
 
 class Orchestrator:
 
-    def __init__(self, llm_client: AsyncOpenAI, serper_api_key: str,
-                 github_api_key: str):
+    def __init__(self,
+                 llm_client: AsyncOpenAI,
+                 serper_api_key: str,
+                 github_api_key: str,
+                 llm_gateway: Optional[LLMGateway] = None,
+                 github_optional_timeout: Optional[float] = None,
+                 context_budgets: Optional[Dict[str, int]] = None,
+                 default_context_budget: int = DEFAULT_CONTEXT_BUDGET,
+                 serper_scrape_url: str = SERPER_SCRAPE_URL,
+                 github_api_url: str = GITHUB_API_URL,
+                 http_client: Optional[HttpClient] = None,
+                 scrape_cache: Optional[ScrapeCache] = None,
+                 parse_cache: Optional[ParseCache] = None,
+                 github_max_concurrency: int = 4,
+                 github_rate_limiter: Optional[GithubRateLimiter] = None,
+                 github_cache: Optional[TieredCache] = None,
+                 github_languages_max_repos: Optional[int] = 50,
+                 sectioned_stages: Optional[Collection[str]] = None):
         self.llm_client = llm_client
+        self.github_optional_timeout = github_optional_timeout
+        # Token budget for the job/LinkedIn/GitHub context, per agent stage
+        self.context_budgets = context_budgets or {}
+        self.default_context_budget = default_context_budget
+        self.llm_gateway = llm_gateway or LLMGateway(llm_client)
+        # Agent stages that write their resume as an outline plus
+        # concurrent per-section calls instead of one long completion
+        self.sectioned_stages = set(sectioned_stages or ())
+        self.section_writer = SectionWriter(self.llm_gateway)
+        self.http_client = http_client or HttpClient()
         self.web_scraper = WebScraper(api_key=serper_api_key,
-                                      llm_client=self.llm_client)
-        self.github_scraper = GithubScraper(github_token=github_api_key)
+                                      llm_client=self.llm_client,
+                                      llm_gateway=self.llm_gateway,
+                                      base_url=serper_scrape_url,
+                                      http_client=self.http_client,
+                                      scrape_cache=scrape_cache,
+                                      parse_cache=parse_cache)
+        self.github_scraper = GithubScraper(
+            github_token=github_api_key,
+            base_url=github_api_url,
+            http_client=self.http_client,
+            max_concurrency=github_max_concurrency,
+            rate_limiter=github_rate_limiter,
+            cache=github_cache,
+            include_languages=github_languages_max_repos is not None,
+            languages_max_repos=github_languages_max_repos or 0)
 
     async def read_resume_file(self, file_path: str) -> str:
         try:
             async with aiofiles.open(file_path, mode="r") as file:
                 return await file.read()
         except IOError as e:
-            raise ValueError(
+            raise InvalidRequestError(
                 f"Unable to read resume file at {file_path}: {str(e)}")
 
+    def construct_shared_context(self, context: Dict[str, Any]) -> str:
+        # Candidate data first: it is identical for every job in a batch
+        return (f"LinkedIn Profile:\n{context['linkedin_json']}\n\n"
+                f"GitHub Information:\n{context['github_json']}\n\n"
+                f"Job Description:\n{context['job_json']}")
+
+    def build_messages(self, agent: ResumeAgent,
+                       context: Dict[str, Any]) -> List[Dict[str, str]]:
+        """
+        Lays out the prompt with the shared system and context messages
+        first and the agent's own role and task last.
+        """
+        return [
+            {
+                "role": "system",
+                "content": SHARED_SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": self.construct_shared_context(context)
+            },
+            {
+                "role":
+                "user",
+                "content":
+                f"You are the {agent.name}. {agent.description}\n" +
+                self.construct_prompt(agent, context)
+            },
+        ]
+
     async def process_with_agent(self, agent: ResumeAgent,
                                  context: Dict[str, Any]) -> ResumeContent:
-        prompt = self.construct_prompt(agent, context)
+        messages = self.build_messages(agent, context)
         try:
-            response = await self.llm_client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {
-                        "role":
-                        "system",
-                        "content":
-                        f"You are the {agent.name}. {agent.description}",
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    },
-                ],
-            )
-
-            # Extract the content from the response
-            content = response.choices[0].message.content
+            if agent.stage in self.sectioned_stages:
+                content = await self.section_writer.write(messages,
+                                                          agent.stage)
+            else:
+                content = await self.llm_gateway.create(messages=messages,
+                                                        stage=agent.stage)
 
             # Create a ResumeContent object
             resume_content = ResumeContent(content)
@@ -64,24 +161,33 @@ class Orchestrator:
             logfire.error(f"Error processing with {agent.name}: {str(e)}")
             raise ValueError(f"Failed to process with {agent.name}: {str(e)}")
 
+    async def stream_with_agent(self, agent: ResumeAgent,
+                                context: Dict[str, Any]) -> AsyncIterator[str]:
+        messages = self.build_messages(agent, context)
+        try:
+            if agent.stage in self.sectioned_stages:
+                tokens = self.section_writer.stream(messages, agent.stage)
+            else:
+                tokens = self.llm_gateway.stream(messages=messages,
+                                                 stage=agent.stage)
+            async for token in tokens:
+                yield token
+            logfire.info(f"Successfully streamed with {agent.name}")
+        except Exception as e:
+            logfire.error(f"Error streaming with {agent.name}: {str(e)}")
+            raise ValueError(f"Failed to process with {agent.name}: {str(e)}")
+
     def construct_prompt(self, agent: ResumeAgent, context: Dict[str,
                                                                  Any]) -> str:
         if isinstance(agent, ExistingResumeAgent):
             return f"""
             Role: You are an expert resume tailoring specialist. Your task is to customize an existing resume to perfectly match a specific job description.
 
-            Task: Analyze the provided existing resume and job description. Then, create a tailored version of the resume that highlights the most relevant skills, experiences, and achievements for the target position.
+            Task: Analyze the existing resume below and the job description above. Then, create a tailored version of the resume that highlights the most relevant skills, experiences, and achievements for the target position. Use the LinkedIn profile and GitHub information above as additional context.
 
             Existing Resume:
             {context['existing_resume']}
 
-            Job Description:
-            {json.dumps(context['job_information'].dict(), indent=2, cls=CustomJSONEncoder)}
-
-            Additional Context:
-            LinkedIn Profile: {json.dumps(context['linkedin_profile'].dict(), indent=2, cls=CustomJSONEncoder)}
-            GitHub Information: {json.dumps(context['github_info'], indent=2, cls=CustomJSONEncoder)}
-
             Instructions:
             1. Maintain the overall structure of the existing resume.
             2. Highlight skills and experiences that directly relate to the job description.
@@ -96,19 +202,10 @@ class Orchestrator:
             """
 
         elif isinstance(agent, LinkedInAgent):
-            return f"""
+            return """
             Role: You are an expert LinkedIn profile analyzer and resume creator. Your task is to craft a comprehensive resume based on a LinkedIn profile, while taking into account a specific job description.
 
-            Task: Analyze the provided LinkedIn profile and job description. Then, create a detailed resume that showcases the candidate's qualifications and experience in a way that aligns with the target position.
-
-            LinkedIn Profile:
-            {json.dumps(context['linkedin_profile'].dict(), indent=2, cls=CustomJSONEncoder)}
-
-            Job Description:
-            {json.dumps(context['job_information'].dict(), indent=2, cls=CustomJSONEncoder)}
-
-            GitHub Information:
-            {json.dumps(context['github_info'], indent=2, cls=CustomJSONEncoder)}
+            Task: Analyze the LinkedIn profile, GitHub information and job description above. Then, create a detailed resume that showcases the candidate's qualifications and experience in a way that aligns with the target position.
 
             Instructions:
             1. Create a well-structured resume using information from the LinkedIn profile.
@@ -127,7 +224,7 @@ class Orchestrator:
             return f"""
             Role: You are an expert resume optimization specialist. Your task is to create the best possible resume by combining and refining input from multiple sources.
 
-            Task: Analyze two different versions of a resume, along with the original job description, LinkedIn profile, and GitHub information. Then, create an optimized resume that incorporates the strongest elements from all sources.
+            Task: Analyze the two versions of the resume below, along with the job description, LinkedIn profile, and GitHub information above. Then, create an optimized resume that incorporates the strongest elements from all sources.
 
             Resume from Existing Resume Agent:
             {context['existing_resume_output']}
@@ -135,15 +232,6 @@ class Orchestrator:
             Resume from LinkedIn Agent:
             {context['linkedin_resume_output']}
 
-            Job Description:
-            {json.dumps(context['job_information'].dict(), indent=2, cls=CustomJSONEncoder)}
-
-            LinkedIn Profile:
-            {json.dumps(context['linkedin_profile'].dict(), indent=2, cls=CustomJSONEncoder)}
-
-            GitHub Information:
-            {json.dumps(context['github_info'], indent=2, cls=CustomJSONEncoder)}
-
             Instructions:
             1. Compare both input resumes and identify the strongest elements from each.
             2. Ensure the final resume is perfectly tailored to the job description.
@@ -162,73 +250,275 @@ class Orchestrator:
         else:
             raise ValueError(f"Unknown agent type: {type(agent)}")
 
+    def check_fetch_result(self, result: Any, source: str) -> Any:
+        if isinstance(result, dict) and "error" in result:
+            logfire.error(f"Failed to fetch {source}", error=result["error"])
+            status = result.get("status")
+            if (status is not None and 400 <= status < 500
+                    and status not in RETRYABLE_CLIENT_STATUSES):
+                raise InvalidRequestError(
+                    f"Failed to fetch {source}: {result['error']}")
+            raise ValueError(f"Failed to fetch {source}: {result['error']}")
+        return result
+
+    def check_request(self, job_url: str, linkedin_url: str,
+                      candidate_context: Optional[Dict[str, Any]]) -> None:
+        if not job_url:
+            raise InvalidRequestError("No job URL provided")
+        if candidate_context is None and not linkedin_url:
+            raise InvalidRequestError("No LinkedIn URL provided")
+
+    def add_context_stage(self, graph: StageGraph,
+                          agent: ResumeAgent) -> str:
+        """
+        Adds the stage that packs the job and candidate context into the
+        agent's token budget. Agents with the same budget share one stage.
+        """
+        budget = self.context_budgets.get(agent.stage,
+                                          self.default_context_budget)
+        name = f"prompt_context_{budget}"
+        if name in graph.stages:
+            return name
+
+        async def pack(job_information: Any,
+                       job_json: str,
+                       linkedin_context: Any,
+                       github_context: Any) -> PackedContext:
+            packed = pack_context(job_information, job_json,
+                                  linkedin_context, github_context
+                                  or github_source(None), budget)
+            for section, labels in packed.dropped.items():
+                PROMPT_CONTEXT_DROPPED.inc(len(labels), section=section)
+            logfire.info("Packed prompt context", **packed.report())
+            return packed
+
+        inputs = ["job_information", "job_json", "linkedin_context"]
+        if self.github_optional_timeout is None:
+            graph.add_stage(name, pack, inputs=inputs + ["github_context"])
+        else:
+            graph.add_stage(name,
+                            pack,
+                            inputs=inputs,
+                            optional_inputs=["github_context"],
+                            optional_timeout=self.github_optional_timeout)
+        return name
+
+    def add_agent_stage(self, graph: StageGraph, name: str,
+                        agent: ResumeAgent, inputs: List[str]) -> None:
+        context_stage = self.add_context_stage(graph, agent)
+
+        async def run_agent(**context: Any) -> str:
+            context.update(context.pop(context_stage).prompt_fields())
+            resume_content = await self.process_with_agent(agent, context)
+            return resume_content.markdown_content
+
+        graph.add_stage(name, run_agent, inputs=inputs + [context_stage])
+
+    def build_pipeline(
+        self,
+        job_url: str,
+        linkedin_url: str,
+        resume_file_path: str,
+        github_url: Optional[str] = None,
+        candidate_context: Optional[Dict[str, Any]] = None,
+        bypass_cache: bool = False,
+    ) -> StageGraph:
+        """
+        Expresses a resume request as a stage graph up to the two drafting
+        agents. Each agent starts as soon as the sources it reads resolve.
+        A pre-resolved candidate_context replaces the candidate stages, and
+        bypass_cache re-scrapes pages instead of using cached copies.
+        """
+        graph = StageGraph()
+
+        async def fetch_job_information() -> Any:
+            return self.check_fetch_result(
+                await self.web_scraper.fetch_and_parse_job_description(
+                    job_url, bypass_cache),
+                "job information")
+
+        async def fetch_linkedin_profile() -> Any:
+            return self.check_fetch_result(
+                await self.web_scraper.fetch_and_parse_linkedin_profile(
+                    linkedin_url, bypass_cache),
+                "LinkedIn profile")
+
+        async def read_existing_resume() -> str:
+            return await self.read_resume_file(resume_file_path)
+
+        async def fetch_github_info() -> Dict[str, Any]:
+            return await self.github_scraper.fetch_github_info(github_url)
+
+        async def encode_job(job_information: Any) -> str:
+            return encode_for_prompt(job_information)
+
+        async def encode_linkedin(linkedin_profile: Any) -> Any:
+            return linkedin_source(linkedin_profile)
+
+        async def encode_github(github_info: Any) -> Any:
+            return github_source(github_info)
+
+        graph.add_stage("job_information", fetch_job_information)
+        graph.add_stage("job_json", encode_job, inputs=["job_information"])
+        if candidate_context is not None:
+            for name in CANDIDATE_INPUTS:
+                graph.add_value(name, candidate_context[name])
+        else:
+            graph.add_stage("linkedin_profile", fetch_linkedin_profile)
+            graph.add_stage("linkedin_context",
+                            encode_linkedin,
+                            inputs=["linkedin_profile"])
+            graph.add_stage("existing_resume", read_existing_resume)
+            if github_url:
+                graph.add_stage("github_info", fetch_github_info)
+            else:
+                graph.add_value("github_info", None)
+            graph.add_stage("github_context",
+                            encode_github,
+                            inputs=["github_info"])
+
+        self.add_agent_stage(graph, "existing_resume_output",
+                             ExistingResumeAgent(),
+                             ["existing_resume"])
+        self.add_agent_stage(graph, "linkedin_resume_output", LinkedInAgent(),
+                             [])
+        return graph
+
+    async def run_pipeline(self, graph: StageGraph,
+                           targets: List[str]) -> Dict[str, Any]:
+        try:
+            return await graph.run(targets)
+        finally:
+            for name, timing in graph.timings.items():
+                if name not in graph.errors:
+                    PIPELINE_STAGE_SECONDS.observe(timing.duration, stage=name)
+            for name in graph.errors:
+                PIPELINE_ERRORS.inc(stage=name)
+            last_target = max(
+                (name for name in targets if name in graph.timings),
+                key=lambda name: graph.timings[name].finished_at,
+                default=None)
+            logfire.info("Resume pipeline timings",
+                         stages=graph.timing_report(),
+                         critical_path=graph.critical_path(last_target)
+                         if last_target else [])
+
     async def process_resume_request(
         self,
         job_url: str,
         linkedin_url: str,
         resume_file_path: str,
         github_url: Optional[str] = None,
+        candidate_context: Optional[Dict[str, Any]] = None,
+        bypass_cache: bool = False,
     ) -> ResumeContent:
-        # Gather all necessary information concurrently
-        job_info_task = self.web_scraper.fetch_and_parse_job_description(
-            job_url)
-        linkedin_profile_task = self.web_scraper.fetch_and_parse_linkedin_profile(
-            linkedin_url)
-        existing_resume_task = self.read_resume_file(resume_file_path)
-        github_info_task = (self.github_scraper.fetch_github_info(github_url)
-                            if github_url else asyncio.create_task(
-                                asyncio.sleep(0)))
-
-        job_information, linkedin_profile, existing_resume, github_info = (
-            await asyncio.gather(
-                job_info_task,
-                linkedin_profile_task,
-                existing_resume_task,
-                github_info_task,
-            ))
-
-        # Check for errors in job_information and linkedin_profile
-        if isinstance(job_information, dict) and "error" in job_information:
-            logfire.error("Failed to fetch job information",
-                          error=job_information["error"])
-            raise ValueError(
-                f"Failed to fetch job information: {job_information['error']}")
-
-        if isinstance(linkedin_profile, dict) and "error" in linkedin_profile:
-            logfire.error("Failed to fetch LinkedIn profile",
-                          error=linkedin_profile["error"])
-            raise ValueError(
-                f"Failed to fetch LinkedIn profile: {linkedin_profile['error']}"
-            )
-
-        context = {
-            "job_information": job_information,
-            "linkedin_profile": linkedin_profile,
-            "existing_resume": existing_resume,
-            "github_info": github_info,
-        }
+        self.check_request(job_url, linkedin_url, candidate_context)
+        graph = self.build_pipeline(job_url, linkedin_url, resume_file_path,
+                                    github_url, candidate_context,
+                                    bypass_cache)
 
-        # Process with ExistingResumeAgent and LinkedInAgent concurrently
-        existing_resume_task = self.process_with_agent(ExistingResumeAgent(),
-                                                       context)
-        linkedin_resume_task = self.process_with_agent(LinkedInAgent(),
-                                                       context)
+        context_stage = self.add_context_stage(graph, AggregatorAgent())
 
-        existing_resume_output, linkedin_resume_output = await asyncio.gather(
-            existing_resume_task, linkedin_resume_task)
+        async def aggregate(**context: Any) -> ResumeContent:
+            context.update(context.pop(context_stage).prompt_fields())
+            return await self.process_with_agent(AggregatorAgent(), context)
 
-        # Prepare context for AggregatorAgent
-        aggregator_context = {
-            **context,
-            "existing_resume_output": existing_resume_output.markdown_content,
-            "linkedin_resume_output": linkedin_resume_output.markdown_content,
-        }
+        graph.add_stage("final_resume",
+                        aggregate,
+                        inputs=AGGREGATOR_INPUTS + [context_stage])
 
-        # Process with AggregatorAgent
-        final_resume = await self.process_with_agent(AggregatorAgent(),
-                                                     aggregator_context)
+        results = await self.run_pipeline(graph, ["final_resume"])
+        return results["final_resume"]
 
-        return final_resume
+    async def stream_resume_request(
+        self,
+        job_url: str,
+        linkedin_url: str,
+        resume_file_path: str,
+        github_url: Optional[str] = None,
+        bypass_cache: bool = False,
+    ) -> AsyncIterator[str]:
+        """
+        Runs the pipeline like process_resume_request, but yields the
+        AggregatorAgent's output tokens as they are generated.
+        """
+        self.check_request(job_url, linkedin_url, None)
+        graph = self.build_pipeline(job_url,
+                                    linkedin_url,
+                                    resume_file_path,
+                                    github_url,
+                                    bypass_cache=bypass_cache)
+        context_stage = self.add_context_stage(graph, AggregatorAgent())
+        results = await self.run_pipeline(graph,
+                                          AGGREGATOR_INPUTS + [context_stage])
+        aggregator_context = {
+            name: results.get(name)
+            for name in AGGREGATOR_INPUTS
+        }
+        aggregator_context.update(results[context_stage].prompt_fields())
+
+        async for token in self.stream_with_agent(AggregatorAgent(),
+                                                  aggregator_context):
+            yield token
+
+    async def resolve_candidate_context(
+            self,
+            linkedin_url: str,
+            resume_file_path: str,
+            github_url: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Fetches and parses the candidate's LinkedIn profile, resume and
+        GitHub data once so they can be shared across many job postings.
+        """
+        graph = self.build_pipeline("", linkedin_url, resume_file_path,
+                                    github_url)
+        results = await self.run_pipeline(graph, CANDIDATE_INPUTS)
+        return {name: results[name] for name in CANDIDATE_INPUTS}
+
+    async def process_batch_request(
+        self,
+        job_urls: List[str],
+        linkedin_url: str,
+        resume_file_path: str,
+        github_url: Optional[str] = None,
+        concurrency: int = 4,
+    ) -> AsyncIterator[Tuple[str, Union[ResumeContent, Exception]]]:
+        """
+        Tailors one candidate against many job postings. The candidate
+        context is resolved once, then at most `concurrency` postings are
+        processed at a time. Yields (job_url, resume or error) pairs in
+        completion order.
+        """
+        candidate_context = await self.resolve_candidate_context(
+            linkedin_url, resume_file_path, github_url)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def tailor(
+                job_url: str
+        ) -> Tuple[str, Union[ResumeContent, Exception]]:
+            # Batch work yields to interactive requests in the LLM scheduler
+            llm_priority.set(Priority.BATCH)
+            async with semaphore:
+                try:
+                    return job_url, await self.process_resume_request(
+                        job_url,
+                        linkedin_url,
+                        resume_file_path,
+                        github_url,
+                        candidate_context=candidate_context)
+                except Exception as e:
+                    logfire.error("Batch resume request failed",
+                                  job_url=job_url,
+                                  error=str(e))
+                    return job_url, e
+
+        tasks = [asyncio.ensure_future(tailor(job_url)) for job_url in job_urls]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield await next_result
+        finally:
+            for task in tasks:
+                task.cancel()
 
     async def write_resume_to_file(self, resume_content: str,
                                    output_file_path: str) -> None:
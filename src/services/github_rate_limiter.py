@@ -0,0 +1,157 @@
+import asyncio
+import time
+from typing import Dict, Mapping, Optional
+import logfire
+from src.utils.http_headers import header_int
+from src.utils.metrics import (GITHUB_RATE_LIMIT, GITHUB_RATE_LIMIT_EVENTS,
+                               GITHUB_RATE_LIMIT_WAIT_SECONDS)
+
+CORE = "core"
+SEARCH = "search"
+
+
+class GithubRateLimited(Exception):
+    """
+    Raised when a request would have to wait longer than the limiter's
+    max_wait_seconds for the quota to reset.
+    """
+
+    def __init__(self, resource: str, wait_seconds: float):
+        super().__init__(f"GitHub {resource} rate limit exhausted for "
+                         f"another {wait_seconds:.0f} seconds")
+        self.resource = resource
+        self.wait_seconds = wait_seconds
+
+
+class RateLimitWindow:
+    """
+    What GitHub last reported for one rate-limit resource, with requests
+    sent since then subtracted from `remaining`.
+    """
+
+    def __init__(self):
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0
+        self.paused_until = 0.0
+        self.last_sent = 0.0
+
+
+def resource_for(path: str) -> str:
+    return SEARCH if "/search/" in path else CORE
+
+
+class GithubRateLimiter:
+    """
+    Process-wide pacing for GitHub API requests, per rate-limit resource
+    ("core" or "search").
+
+    Quota comes from the X-RateLimit-* headers on every response. Once
+    less than `pace_below` of the window is left, requests are spread
+    evenly over the time until it resets. Below the reserve they are
+    queued until the reset, and a 403/429 rate-limit response pauses the
+    resource for its Retry-After or reset time. A request that would
+    wait longer than `max_wait_seconds` raises GithubRateLimited instead.
+
+    The reserve is `reserve` requests, capped at `reserve_fraction` of
+    the window's limit, so small windows such as search (30 a minute)
+    are not held back entirely.
+    """
+
+    def __init__(self,
+                 reserve: int = 50,
+                 reserve_fraction: float = 0.01,
+                 pace_below: float = 0.2,
+                 max_wait_seconds: float = 30.0):
+        self.reserve = reserve
+        self.reserve_fraction = reserve_fraction
+        self.pace_below = pace_below
+        self.max_wait_seconds = max_wait_seconds
+        self.windows: Dict[str, RateLimitWindow] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def window(self, resource: str) -> RateLimitWindow:
+        return self.windows.setdefault(resource, RateLimitWindow())
+
+    def reserve_for(self, window: RateLimitWindow) -> int:
+        if window.limit is None:
+            return self.reserve
+        return min(self.reserve, int(window.limit * self.reserve_fraction))
+
+    def _delay_for(self, window: RateLimitWindow, now: float) -> float:
+        delay = max(0.0, window.paused_until - now)
+        if window.remaining is None or window.limit is None:
+            return delay
+        until_reset = window.reset_at - now
+        if until_reset <= 0:
+            window.remaining = window.limit
+            return delay
+        reserve = self.reserve_for(window)
+        if window.remaining <= reserve:
+            return max(delay, until_reset)
+        if window.remaining < window.limit * self.pace_below:
+            interval = until_reset / (window.remaining - reserve)
+            return max(delay, window.last_sent + interval - now)
+        return delay
+
+    async def acquire(self, resource: str) -> None:
+        """
+        Waits until a request against `resource` may be sent. Requests
+        queue in arrival order while the resource is being paced.
+        """
+        lock = self._locks.setdefault(resource, asyncio.Lock())
+        async with lock:
+            window = self.window(resource)
+            delay = self._delay_for(window, time.time())
+            if delay > self.max_wait_seconds:
+                GITHUB_RATE_LIMIT_EVENTS.inc(resource=resource,
+                                             event="exhausted")
+                raise GithubRateLimited(resource, delay)
+            if delay > 0:
+                GITHUB_RATE_LIMIT_EVENTS.inc(resource=resource,
+                                             event="delayed")
+                GITHUB_RATE_LIMIT_WAIT_SECONDS.inc(delay, resource=resource)
+                await asyncio.sleep(delay)
+            window.last_sent = time.time()
+            if window.remaining is not None:
+                window.remaining -= 1
+
+    def observe(self, resource: str, status: int,
+                headers: Mapping[str, str]) -> Optional[float]:
+        """
+        Updates the resource's window from a response. Returns how long
+        to wait before retrying if the response was a rate-limit error.
+        """
+        resource = headers.get("X-RateLimit-Resource") or resource
+        window = self.window(resource)
+        limit = header_int(headers, "X-RateLimit-Limit")
+        remaining = header_int(headers, "X-RateLimit-Remaining")
+        reset_at = header_int(headers, "X-RateLimit-Reset")
+        if limit is not None:
+            window.limit = limit
+            GITHUB_RATE_LIMIT.set(limit, resource=resource, kind="limit")
+        if remaining is not None:
+            window.remaining = remaining
+            GITHUB_RATE_LIMIT.set(remaining,
+                                  resource=resource,
+                                  kind="remaining")
+        if reset_at is not None:
+            window.reset_at = float(reset_at)
+            GITHUB_RATE_LIMIT.set(reset_at,
+                                  resource=resource,
+                                  kind="reset_timestamp")
+
+        if status not in (403, 429):
+            return None
+        retry_after = header_int(headers, "Retry-After")
+        if retry_after is None and remaining != 0:
+            # A 403 that is not about rate limits
+            return None
+        wait = (float(retry_after) if retry_after is not None else
+                max(0.0, window.reset_at - time.time()))
+        window.paused_until = max(window.paused_until, time.time() + wait)
+        GITHUB_RATE_LIMIT_EVENTS.inc(resource=resource, event="rate_limited")
+        logfire.warn("GitHub rate limit hit",
+                     resource=resource,
+                     wait_seconds=round(wait, 1))
+        return wait
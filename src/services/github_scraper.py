@@ -1,13 +1,193 @@
-from typing import Any, Dict, List
+import asyncio
+import json
+import math
+import re
+import time
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+from urllib.parse import urlencode
 from datetime import datetime, timedelta
 import aiohttp
 import logfire
+from src.services.github_rate_limiter import (GithubRateLimited,
+                                              GithubRateLimiter, resource_for)
+from src.services.http_client import HttpClient
+from src.utils.metrics import (GITHUB_FETCH_REQUESTS, GITHUB_FETCH_SECONDS,
+                               GITHUB_REQUESTS)
+from src.utils.single_flight import SingleFlight
+from src.utils.tiered_cache import TieredCache
+
+GITHUB_API_URL = "https://api.github.com"
+REPOS_PER_PAGE = 100
+
+_LAST_PAGE = re.compile(r'<([^>]*[?&]page=(\d+)[^>]*)>;\s*rel="last"')
+
+
+# Response headers kept with cached bodies
+CACHED_HEADERS = ("Link", )
+
+
+class GithubResponse:
+    def __init__(self, status: int, data: Any, headers: Mapping[str, str]):
+        self.status = status
+        self.data = data
+        self.headers = headers
+
+
+class GithubSession:
+    """
+    The GitHub requests made for one profile: bounds how many run at once
+    and counts them for reporting.
+
+    Requests go through the shared rate limiter, and are sent as
+    conditional requests when an earlier response is cached, so a 304
+    answers from the cache without counting against the quota.
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        max_concurrency: int,
+        rate_limiter: Optional[GithubRateLimiter] = None,
+        cache: Optional[TieredCache] = None,
+        max_retries: int = 2,
+    ):
+        self.session = session
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.max_retries = max_retries
+        self.requests = 0
+        self.not_modified = 0
+
+    def cache_key(
+        self, url: str, headers: Mapping[str, str], params: Optional[Dict[str, Any]]
+    ) -> str:
+        query = urlencode(sorted((params or {}).items()))
+        return f"{headers.get('Accept', '')} {url}?{query}"
+
+    async def get(
+        self,
+        url: str,
+        headers: Mapping[str, str],
+        params: Optional[Dict[str, Any]] = None,
+    ) -> GithubResponse:
+        resource = resource_for(url)
+        key = self.cache_key(url, headers, params)
+        cached = None
+        if self.cache is not None:
+            entry = await self.cache.get(key)
+            cached = json.loads(entry) if entry is not None else None
+        request_headers = dict(headers)
+        if cached is not None:
+            if cached.get("etag"):
+                request_headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                request_headers["If-Modified-Since"] = cached["last_modified"]
+
+        attempt = 0
+        while True:
+            # Wait on the limiter before taking a slot, so a paced request
+            # does not hold up this profile's other requests
+            try:
+                if self.rate_limiter is not None:
+                    await self.rate_limiter.acquire(resource)
+            except GithubRateLimited as e:
+                GITHUB_REQUESTS.inc(resource=resource, result="rate_limited")
+                logfire.error("Skipping GitHub request", url=url, error=str(e))
+                return GithubResponse(429, None, {})
+            async with self.semaphore:
+                self.requests += 1
+                async with self.session.get(
+                    url, headers=request_headers, params=params
+                ) as response:
+                    retry_after = (
+                        self.rate_limiter.observe(
+                            resource, response.status, response.headers
+                        )
+                        if self.rate_limiter is not None
+                        else None
+                    )
+                    if response.status == 304 and cached is not None:
+                        self.not_modified += 1
+                        GITHUB_REQUESTS.inc(resource=resource, result="not_modified")
+                        return GithubResponse(200, cached["data"], cached["headers"])
+                    if response.status == 200:
+                        data = await response.json()
+                        GITHUB_REQUESTS.inc(resource=resource, result="ok")
+                        kept = {
+                            name: response.headers[name]
+                            for name in CACHED_HEADERS
+                            if name in response.headers
+                        }
+                        etag = response.headers.get("ETag")
+                        last_modified = response.headers.get("Last-Modified")
+                        if self.cache is not None and (etag or last_modified):
+                            await self.cache.set(
+                                key,
+                                json.dumps(
+                                    {
+                                        "etag": etag,
+                                        "last_modified": last_modified,
+                                        "headers": kept,
+                                        "data": data,
+                                    }
+                                ),
+                            )
+                        return GithubResponse(200, data, kept)
+                    status = response.status
+            if retry_after is None or attempt >= self.max_retries:
+                GITHUB_REQUESTS.inc(
+                    resource=resource,
+                    result="rate_limited" if retry_after is not None else "error",
+                )
+                return GithubResponse(status, None, {})
+            # The limiter now holds this resource until the quota resets
+            attempt += 1
+
+
+def last_page(link_header: Optional[str]) -> Optional[int]:
+    match = _LAST_PAGE.search(link_header or "")
+    return int(match.group(2)) if match else None
+
+
+def language_shares(languages: Dict[str, int], top: int = 10) -> Dict[str, float]:
+    """
+    Percentage of code per language across repos, largest first, keeping
+    the `top` languages.
+    """
+    total = sum(languages.values())
+    if not total:
+        return {}
+    ranked = sorted(languages.items(), key=lambda item: item[1], reverse=True)
+    return {
+        language: round(100 * count / total, 1) for language, count in ranked[:top]
+    }
 
 
 class GithubScraper:
-    def __init__(self, github_token: str):
+    def __init__(
+        self,
+        github_token: str,
+        base_url: str = GITHUB_API_URL,
+        http_client: Optional[HttpClient] = None,
+        max_concurrency: int = 4,
+        rate_limiter: Optional[GithubRateLimiter] = None,
+        cache: Optional[TieredCache] = None,
+        include_languages: bool = True,
+        languages_max_repos: int = 50,
+    ):
         self.github_token = github_token
-        self.base_url = "https://api.github.com"
+        self.base_url = base_url.rstrip("/")
+        self.http_client = http_client or HttpClient()
+        self.max_concurrency = max_concurrency
+        self.rate_limiter = rate_limiter
+        # Earlier responses with their ETag/Last-Modified validators, and
+        # per-repo language breakdowns keyed by the repo's pushed_at
+        self.cache = cache
+        self.include_languages = include_languages
+        self.languages_max_repos = languages_max_repos
+        # Concurrent requests for the same user share one set of API calls
+        self.flights = SingleFlight("github")
         self.headers = {
             "Authorization": f"token {self.github_token}",
             "Accept": "application/vnd.github.v3+json",
@@ -23,77 +203,149 @@ class GithubScraper:
             logfire.error(f"Invalid GitHub URL: {github_url}")
             return {"error": "Invalid GitHub URL"}
 
-        async with aiohttp.ClientSession() as session:
-            user_info = await self.fetch_user_info(session, username)
-            if not user_info:
-                return {"error": f"GitHub user {username} not found"}
+        return await self.flights.run(
+            username.lower(),
+            lambda: self._fetch_github_info(github_url, username))
 
-            repos = await self.fetch_repos(session, username)
-            contributions = await self.fetch_contributions(session, username)
+    def open_session(self) -> GithubSession:
+        return GithubSession(
+            self.http_client.session,
+            self.max_concurrency,
+            rate_limiter=self.rate_limiter,
+            cache=self.cache,
+        )
 
-            return {
-                "url": github_url,
-                "user_info": user_info,
-                "repos": repos,
-                "contributions": contributions,
-            }
+    async def _fetch_github_info(self, github_url: str,
+                                 username: str) -> Dict[str, Any]:
+        started = time.perf_counter()
+        session = self.open_session()
+        # The user, repos and contributions endpoints are independent;
+        # repo pages after the first are fetched in parallel as well
+        user_task = asyncio.ensure_future(self.fetch_user_info(session, username))
+        try:
+            repos, contributions = await asyncio.gather(
+                self.fetch_repos(session, username, user_task),
+                self.fetch_contributions(session, username),
+            )
+            user_info = await user_task
+            languages = (
+                await self.fetch_languages(session, username, repos)
+                if self.include_languages and user_info
+                else {}
+            )
+        finally:
+            user_task.cancel()
+        elapsed = time.perf_counter() - started
+        GITHUB_FETCH_SECONDS.observe(elapsed)
+        GITHUB_FETCH_REQUESTS.observe(session.requests)
+        logfire.info(
+            "Fetched GitHub profile",
+            username=username,
+            requests=session.requests,
+            not_modified=session.not_modified,
+            repos=len(repos),
+            seconds=round(elapsed, 3),
+        )
+        if not user_info:
+            return {"error": f"GitHub user {username} not found"}
+
+        return {
+            "url": github_url,
+            "user_info": user_info,
+            "languages": language_shares(languages),
+            "repos": repos,
+            "contributions": contributions,
+        }
 
     async def fetch_user_info(
-        self, session: aiohttp.ClientSession, username: str
+        self, session: GithubSession, username: str
     ) -> Dict[str, Any]:
         url = f"{self.base_url}/users/{username}"
-        async with session.get(url, headers=self.headers) as response:
-            if response.status == 200:
-                data = await response.json()
-                return {
-                    "name": data.get("name"),
-                    "bio": data.get("bio"),
-                    "public_repos": data.get("public_repos"),
-                    "followers": data.get("followers"),
-                    "following": data.get("following"),
-                    "created_at": data.get("created_at"),
-                }
-            else:
-                logfire.error(f"Failed to fetch user info for {url}: {response.status}")
-                return {}
+        response = await session.get(url, headers=self.headers)
+        if response.status == 200:
+            data = response.data
+            return {
+                "name": data.get("name"),
+                "bio": data.get("bio"),
+                "public_repos": data.get("public_repos"),
+                "followers": data.get("followers"),
+                "following": data.get("following"),
+                "created_at": data.get("created_at"),
+            }
+        else:
+            logfire.error(f"Failed to fetch user info for {url}: {response.status}")
+            return {}
 
-    async def fetch_repos(
-        self, session: aiohttp.ClientSession, username: str
-    ) -> List[Dict[str, Any]]:
+    async def fetch_repos_page(
+        self, session: GithubSession, username: str, page: int
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
         url = f"{self.base_url}/users/{username}/repos"
-        repos = []
-        page = 1
-        per_page = 100
+        response = await session.get(
+            url,
+            headers=self.headers,
+            params={"page": page, "per_page": REPOS_PER_PAGE},
+        )
+        if response.status == 200:
+            return response.data, response.headers.get("Link")
+        logfire.error(f"Failed to fetch repos for {url}: {response.status}")
+        return None, None
 
-        while True:
-            async with session.get(
-                url, headers=self.headers, params={"page": page, "per_page": per_page}
-            ) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    if not data:
-                        break
-                    repos.extend(
-                        [
-                            {
-                                "name": repo["name"],
-                                "description": repo["description"],
-                                "stars": repo["stargazers_count"],
-                                "forks": repo["forks_count"],
-                                "language": repo["language"],
-                            }
-                            for repo in data
-                        ]
+    async def fetch_repos(
+        self,
+        session: GithubSession,
+        username: str,
+        user_info: Optional["asyncio.Future[Dict[str, Any]]"] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Fetches every public repo of the user. The page count comes from
+        the first page's Link header, or from the user's `public_repos`
+        when there is none, and the remaining pages are fetched
+        concurrently.
+        """
+        data, link = await self.fetch_repos_page(session, username, 1)
+        pages = [data or []]
+        if data and len(data) >= REPOS_PER_PAGE:
+            total_pages = last_page(link)
+            if total_pages is None and user_info is not None:
+                public_repos = (await user_info).get("public_repos")
+                if public_repos:
+                    total_pages = math.ceil(public_repos / REPOS_PER_PAGE)
+            if total_pages is not None:
+                pages.extend(
+                    page or []
+                    for page, _ in await asyncio.gather(
+                        *(
+                            self.fetch_repos_page(session, username, page)
+                            for page in range(2, total_pages + 1)
+                        )
+                    )
+                )
+            else:
+                # Neither count is known, so page until a short page
+                page_number = 2
+                while len(pages[-1]) >= REPOS_PER_PAGE:
+                    data, _ = await self.fetch_repos_page(
+                        session, username, page_number
                     )
-                    page += 1
-                else:
-                    logfire.error(f"Failed to fetch repos for {url}: {response.status}")
-                    break
+                    pages.append(data or [])
+                    page_number += 1
 
-        return repos
+        return [
+            {
+                "name": repo["name"],
+                "description": repo["description"],
+                "stars": repo["stargazers_count"],
+                "forks": repo["forks_count"],
+                "language": repo["language"],
+                "fork": repo.get("fork", False),
+                "pushed_at": repo.get("pushed_at"),
+            }
+            for page in pages
+            for repo in page
+        ]
 
     async def fetch_contributions(
-        self, session: aiohttp.ClientSession, username: str
+        self, session: GithubSession, username: str
     ) -> int:
         # GitHub API doesn't provide a direct way to get contribution count
         # We'll approximate it by counting commits in the last year
@@ -102,34 +354,66 @@ class GithubScraper:
         one_year_ago = (datetime.now() - timedelta(days=365)).strftime("%Y-%m-%d")
         query = f"author:{username} committer-date:>{one_year_ago}"
 
-        async with session.get(
+        response = await session.get(
             url, headers=headers, params={"q": query, "per_page": 1}
-        ) as response:
-            if response.status == 200:
-                data = await response.json()
-                return data.get("total_count", 0)
-            else:
-                logfire.error(
-                    f"Failed to fetch contributions for {username}: {response.status}"
-                )
-                return 0
+        )
+        if response.status == 200:
+            return response.data.get("total_count", 0)
+        else:
+            logfire.error(
+                f"Failed to fetch contributions for {username}: {response.status}"
+            )
+            return 0
+
+    async def fetch_repo_languages(
+        self, session: GithubSession, username: str, repo: Dict[str, Any]
+    ) -> Dict[str, int]:
+        """
+        Bytes of code per language in one repo. Results are cached by the
+        repo's pushed_at, so an untouched repo costs no request at all.
+        """
+        key = f"languages:{username.lower()}/{repo['name']}@{repo.get('pushed_at')}"
+        if self.cache is not None and repo.get("pushed_at"):
+            cached = await self.cache.get(key)
+            if cached is not None:
+                return json.loads(cached)
+
+        url = f"{self.base_url}/repos/{username}/{repo['name']}/languages"
+        response = await session.get(url, headers=self.headers)
+        if response.status == 200:
+            if self.cache is not None and repo.get("pushed_at"):
+                await self.cache.set(key, json.dumps(response.data))
+            return response.data
+        logfire.error(
+            f"Failed to fetch languages for repo {repo['name']}: {response.status}"
+        )
+        return {}
 
     async def fetch_languages(
-        self, session: aiohttp.ClientSession, username: str
+        self,
+        session: GithubSession,
+        username: str,
+        repos: Optional[List[Dict[str, Any]]] = None,
     ) -> Dict[str, int]:
-        languages = {}
-        repos = await self.fetch_repos(session, username)
-
-        for repo in repos:
-            url = f"{self.base_url}/repos/{username}/{repo['name']}/languages"
-            async with session.get(url, headers=self.headers) as response:
-                if response.status == 200:
-                    repo_languages = await response.json()
-                    for lang, bytes_count in repo_languages.items():
-                        languages[lang] = languages.get(lang, 0) + bytes_count
-                else:
-                    logfire.error(
-                        f"Failed to fetch languages for repo {repo['name']}: {response.status}"
-                    )
+        """
+        Bytes of code per language across the user's own (non-fork) repos,
+        at most `languages_max_repos` of the most recently pushed ones.
+        Pass `repos` when they were already fetched. Repos are fetched
+        concurrently, bounded by the session.
+        """
+        if repos is None:
+            repos = await self.fetch_repos(session, username)
+        own = sorted(
+            (repo for repo in repos if not repo.get("fork")),
+            key=lambda repo: repo.get("pushed_at") or "",
+            reverse=True,
+        )[: self.languages_max_repos]
+
+        languages: Dict[str, int] = {}
+        for repo_languages in await asyncio.gather(
+            *(self.fetch_repo_languages(session, username, repo) for repo in own)
+        ):
+            for lang, bytes_count in repo_languages.items():
+                languages[lang] = languages.get(lang, 0) + bytes_count
 
         return languages
@@ -0,0 +1,118 @@
+import asyncio
+from types import SimpleNamespace
+from typing import Iterable, Optional
+from urllib.parse import urlsplit
+import aiohttp
+import logfire
+from src.utils.metrics import HTTP_CLIENT_EVENTS, HTTP_CLIENT_IN_FLIGHT
+
+
+class HttpClient:
+    """
+    Application-scoped aiohttp session shared by every scraper, so requests
+    to Serper and GitHub reuse pooled keep-alive connections and cached
+    DNS lookups instead of paying for a new handshake each time.
+
+    The session is opened from the FastAPI lifespan or the worker entry
+    point, or lazily on first use.
+    """
+
+    def __init__(self,
+                 max_connections: int = 100,
+                 max_connections_per_host: int = 20,
+                 dns_cache_seconds: int = 300,
+                 keepalive_seconds: float = 30.0,
+                 timeout_seconds: float = 60.0):
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.dns_cache_seconds = dns_cache_seconds
+        self.keepalive_seconds = keepalive_seconds
+        self.timeout_seconds = timeout_seconds
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session: aiohttp.ClientSession,
+                                   context: SimpleNamespace,
+                                   params: aiohttp.TraceRequestStartParams
+                                   ) -> None:
+            context.host = params.url.host or "unknown"
+            HTTP_CLIENT_IN_FLIGHT.inc(host=context.host)
+
+        async def on_request_done(session: aiohttp.ClientSession,
+                                  context: SimpleNamespace,
+                                  params: object) -> None:
+            HTTP_CLIENT_IN_FLIGHT.dec(host=context.host)
+
+        def count(event: str):
+
+            async def handler(session: aiohttp.ClientSession,
+                              context: SimpleNamespace,
+                              params: object) -> None:
+                host = getattr(context, "host", None) or getattr(
+                    params, "host", "unknown")
+                HTTP_CLIENT_EVENTS.inc(host=host, event=event)
+
+            return handler
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_end.append(on_request_done)
+        trace_config.on_request_exception.append(on_request_done)
+        trace_config.on_connection_create_end.append(
+            count("connection_created"))
+        trace_config.on_connection_reuseconn.append(
+            count("connection_reused"))
+        trace_config.on_connection_queued_start.append(
+            count("connection_queued"))
+        trace_config.on_dns_cache_hit.append(count("dns_cache_hit"))
+        trace_config.on_dns_cache_miss.append(count("dns_cache_miss"))
+        return trace_config
+
+    def open(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_connections_per_host,
+                ttl_dns_cache=self.dns_cache_seconds,
+                keepalive_timeout=self.keepalive_seconds)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout_seconds),
+                trace_configs=[self._trace_config()])
+        return self._session
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        return self.open()
+
+    async def warm_up(self, urls: Iterable[str], connections: int = 2) -> None:
+        """
+        Opens `connections` keep-alive connections to the origin of each
+        URL so the first real requests skip DNS and TLS setup. Failures
+        are logged and otherwise ignored.
+        """
+        origins = {
+            f"{parts.scheme}://{parts.netloc}"
+            for parts in map(urlsplit, urls) if parts.scheme and parts.netloc
+        }
+
+        async def touch(origin: str) -> None:
+            try:
+                async with self.session.head(origin, allow_redirects=False):
+                    pass
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logfire.warn("HTTP connection warm-up failed",
+                             origin=origin,
+                             error=str(e))
+
+        await asyncio.gather(*(touch(origin) for origin in origins
+                               for _ in range(connections)))
+        logfire.info("Warmed up HTTP connections",
+                     origins=sorted(origins),
+                     connections=connections)
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
@@ -0,0 +1,200 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+from pydantic import BaseModel, Field
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class QueuedJob(BaseModel):
+    id: str
+    status: str
+    payload: Dict[str, Any] = Field(default_factory=dict)
+    result: Optional[str] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    created_at: float
+    updated_at: float
+
+
+class JobQueue:
+    """
+    Durable SQLite-backed queue for resume requests. Workers claim jobs
+    under a lease; jobs whose lease expires (for example because a worker
+    died) are handed to another worker until max_attempts is reached.
+    Finished jobs are deleted retention_seconds after they finish; their
+    resumes stay in the ResultStore.
+    """
+
+    def __init__(self,
+                 path: str,
+                 lease_seconds: float = 300.0,
+                 max_attempts: int = 3,
+                 retention_seconds: float = 7 * 86400,
+                 sweep_interval: float = 3600.0):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retention_seconds = retention_seconds
+        self.sweep_interval = sweep_interval
+        self._next_sweep = 0.0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path,
+                                     check_same_thread=False,
+                                     isolation_level=None,
+                                     timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker_id TEXT,
+                lease_expires_at REAL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_status_created_at "
+            "ON jobs (status, created_at)")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_status_updated_at "
+            "ON jobs (status, updated_at)")
+
+    def _row_to_job(self, row: Any) -> QueuedJob:
+        return QueuedJob(id=row[0],
+                         status=row[1],
+                         payload=json.loads(row[2]),
+                         result=row[3],
+                         error=row[4],
+                         attempts=row[5],
+                         created_at=row[6],
+                         updated_at=row[7])
+
+    def _enqueue(self, payload: Dict[str, Any]) -> str:
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, payload, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(payload), now, now))
+        return job_id
+
+    def _claim(self, worker_id: str) -> Optional[QueuedJob]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Jobs whose lease expired too often are given up on
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, updated_at = ? "
+                    "WHERE status = ? AND lease_expires_at < ? "
+                    "AND attempts >= ?",
+                    (FAILED, "Worker lease expired too many times", now,
+                     RUNNING, now, self.max_attempts))
+                if now >= self._next_sweep:
+                    self._next_sweep = now + self.sweep_interval
+                    self._conn.execute(
+                        "DELETE FROM jobs WHERE status IN (?, ?) "
+                        "AND updated_at < ?",
+                        (SUCCEEDED, FAILED, now - self.retention_seconds))
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE status = ? "
+                    "OR (status = ? AND lease_expires_at < ?) "
+                    "ORDER BY created_at LIMIT 1",
+                    (QUEUED, RUNNING, now)).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, worker_id = ?, "
+                    "lease_expires_at = ?, attempts = attempts + 1, "
+                    "updated_at = ? WHERE id = ?",
+                    (RUNNING, worker_id, now + self.lease_seconds, now,
+                     row[0]))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self._get(row[0])
+
+    def _heartbeat(self, job_id: str, worker_id: str) -> bool:
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET lease_expires_at = ?, updated_at = ? "
+                "WHERE id = ? AND worker_id = ? AND status = ?",
+                (now + self.lease_seconds, now, job_id, worker_id, RUNNING))
+        return cursor.rowcount == 1
+
+    def _complete(self, job_id: str, worker_id: str, result: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = NULL, "
+                "lease_expires_at = NULL, updated_at = ? "
+                "WHERE id = ? AND worker_id = ?",
+                (SUCCEEDED, result, time.time(), job_id, worker_id))
+
+    def _fail(self, job_id: str, worker_id: str, error: str,
+              retry: bool) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = CASE WHEN ? AND attempts < ? "
+                "THEN ? ELSE ? END, error = ?, lease_expires_at = NULL, "
+                "updated_at = ? WHERE id = ? AND worker_id = ?",
+                (retry, self.max_attempts, QUEUED, FAILED, error, time.time(),
+                 job_id, worker_id))
+
+    def _get(self, job_id: str) -> Optional[QueuedJob]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, payload, result, error, attempts, "
+                "created_at, updated_at FROM jobs WHERE id = ?",
+                (job_id, )).fetchone()
+        return self._row_to_job(row) if row is not None else None
+
+    def _counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    async def enqueue(self, payload: Dict[str, Any]) -> str:
+        return await asyncio.to_thread(self._enqueue, payload)
+
+    async def claim(self, worker_id: str) -> Optional[QueuedJob]:
+        return await asyncio.to_thread(self._claim, worker_id)
+
+    async def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        return await asyncio.to_thread(self._heartbeat, job_id, worker_id)
+
+    async def complete(self, job_id: str, worker_id: str, result: str) -> None:
+        await asyncio.to_thread(self._complete, job_id, worker_id, result)
+
+    async def fail(self,
+                   job_id: str,
+                   worker_id: str,
+                   error: str,
+                   retry: bool = False) -> None:
+        await asyncio.to_thread(self._fail, job_id, worker_id, error, retry)
+
+    async def get(self, job_id: str) -> Optional[QueuedJob]:
+        return await asyncio.to_thread(self._get, job_id)
+
+    async def counts(self) -> Dict[str, int]:
+        return await asyncio.to_thread(self._counts)
@@ -0,0 +1,303 @@
+import asyncio
+import hashlib
+import time
+import json
+from functools import lru_cache
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Type
+from openai import AsyncOpenAI
+from pydantic import BaseModel
+from src.services.llm_scheduler import LLMScheduler
+from src.services.model_router import ModelRoute, ModelRouter
+from src.utils.metrics import LLM_CALL_SECONDS, LLM_EVENTS, LLM_TOKENS
+from src.utils.tiered_cache import TieredCache
+from src.utils.tokens import estimate_messages_tokens
+import logfire
+
+
+@lru_cache(maxsize=None)
+def response_model_schema(response_model: Type[BaseModel]) -> str:
+    return json.dumps(response_model.model_json_schema(), sort_keys=True)
+
+
+class LLMGateway:
+    """
+    Single entry point for chat-completion calls. Responses are cached by
+    a content hash of (model, messages, response_model schema), and calls
+    that reach the provider go through the shared scheduler when one is set.
+
+    Calls can be hedged: if a call has not finished after hedge_delay
+    seconds a duplicate is fired and whichever finishes first wins. Every
+    call is bounded by a deadline, either per call or the gateway default.
+    Models are chosen per pipeline stage by the ModelRouter.
+    """
+
+    def __init__(self,
+                 llm_client: AsyncOpenAI,
+                 cache: Optional[TieredCache] = None,
+                 scheduler: Optional[LLMScheduler] = None,
+                 expected_completion_tokens: int = 1500,
+                 hedge_delay: Optional[float] = None,
+                 deadline: Optional[float] = None,
+                 router: Optional[ModelRouter] = None):
+        self.llm_client = llm_client
+        self.router = router or ModelRouter(
+            routes={}, default_route=ModelRoute(model="gpt-4"))
+        self.cache = cache
+        self.scheduler = scheduler
+        self.expected_completion_tokens = expected_completion_tokens
+        self.hedge_delay = hedge_delay
+        self.deadline = deadline
+        self.stats: Dict[str, int] = {
+            "calls": 0,
+            "hedges_fired": 0,
+            "hedges_won": 0,
+            "deadlines_exceeded": 0,
+            "cached_prompt_tokens": 0,
+        }
+
+    async def _call(self, messages: List[Dict[str, str]],
+                    **kwargs: Any) -> Any:
+
+        async def call() -> Any:
+            return await self.llm_client.chat.completions.create(
+                messages=messages, **kwargs)
+
+        if self.scheduler is None:
+            return await call()
+        estimated_tokens = (estimate_messages_tokens(messages) +
+                            self.expected_completion_tokens)
+        return await self.scheduler.run(call, estimated_tokens)
+
+    async def _hedged(self, call: Callable[[], Awaitable[Any]]) -> Any:
+        primary = asyncio.ensure_future(call())
+        tasks = [primary]
+        # Cancel whatever is still running on every exit, including the
+        # caller's deadline or cancellation before the hedge fires
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay)
+            if done:
+                return primary.result()
+
+            self.stats["hedges_fired"] += 1
+            LLM_EVENTS.inc(event="hedge_fired")
+            hedge = asyncio.ensure_future(call())
+            tasks.append(hedge)
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.stats["hedges_won"] += 1
+                            LLM_EVENTS.inc(event="hedge_won")
+                        return task.result()
+            # Both attempts failed; surface the primary's error
+            return primary.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _dispatch(self,
+                        messages: List[Dict[str, str]],
+                        deadline: Optional[float] = None,
+                        hedge: bool = True,
+                        **kwargs: Any) -> Any:
+        self.stats["calls"] += 1
+        LLM_EVENTS.inc(event="call")
+
+        def call() -> Awaitable[Any]:
+            return self._call(messages, **kwargs)
+
+        operation = (self._hedged(call) if hedge
+                     and self.hedge_delay is not None else call())
+        deadline = deadline if deadline is not None else self.deadline
+        try:
+            return await asyncio.wait_for(operation, deadline)
+        except asyncio.TimeoutError:
+            self.stats["deadlines_exceeded"] += 1
+            LLM_EVENTS.inc(event="deadline_exceeded")
+            logfire.warn("LLM call exceeded its deadline",
+                         model=kwargs.get("model"),
+                         deadline=deadline)
+            raise TimeoutError(
+                f"LLM call did not finish within {deadline} seconds")
+
+    def cache_key(self,
+                  model: str,
+                  messages: List[Dict[str, str]],
+                  response_model: Optional[Type[BaseModel]] = None) -> str:
+        payload = json.dumps(
+            {
+                "model":
+                model,
+                "messages":
+                messages,
+                "schema":
+                response_model_schema(response_model)
+                if response_model else None,
+            },
+            sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _record_call(self,
+                     stage: Optional[str],
+                     model: str,
+                     started: float,
+                     ok: bool,
+                     usage: Any = None) -> None:
+        latency = time.perf_counter() - started
+        self.router.record(model, latency, ok=ok)
+        stage = stage or "unknown"
+        if not ok:
+            LLM_EVENTS.inc(event="error")
+            return
+        LLM_CALL_SECONDS.observe(latency, stage=stage, model=model)
+        if usage is not None:
+            LLM_TOKENS.inc(usage.prompt_tokens or 0,
+                           stage=stage,
+                           model=model,
+                           kind="prompt")
+            LLM_TOKENS.inc(usage.completion_tokens or 0,
+                           stage=stage,
+                           model=model,
+                           kind="completion")
+            # Prompt tokens served from the provider's prefix cache
+            details = getattr(usage, "prompt_tokens_details", None)
+            cached = getattr(details, "cached_tokens", None) or 0
+            if cached:
+                self.stats["cached_prompt_tokens"] += cached
+                LLM_TOKENS.inc(cached,
+                               stage=stage,
+                               model=model,
+                               kind="cached")
+
+    async def _create_with_model(self, stage: Optional[str], model: str,
+                                 messages: List[Dict[str, str]],
+                                 response_model: Optional[Type[BaseModel]],
+                                 deadline: Optional[float]) -> Any:
+        key = None
+        if self.cache is not None:
+            key = self.cache_key(model, messages, response_model)
+            cached = await self.cache.get(key)
+            if cached is not None:
+                logfire.info("LLM cache hit", model=model)
+                if response_model is not None:
+                    return response_model.model_validate_json(cached)
+                return cached
+
+        started = time.perf_counter()
+        try:
+            if response_model is not None:
+                result = await self._dispatch(messages,
+                                              deadline=deadline,
+                                              model=model,
+                                              response_model=response_model)
+                value = result.model_dump_json()
+                # Instructor keeps the provider response on the parsed model
+                response = getattr(result, "_raw_response", None)
+            else:
+                response = await self._dispatch(messages,
+                                                deadline=deadline,
+                                                model=model)
+                result = value = response.choices[0].message.content
+        except Exception:
+            self._record_call(stage, model, started, ok=False)
+            raise
+        self._record_call(stage, model, started, True,
+                          getattr(response, "usage", None))
+
+        if key is not None and value is not None:
+            await self.cache.set(key, value)
+        return result
+
+    async def create(self,
+                     messages: List[Dict[str, str]],
+                     response_model: Optional[Type[BaseModel]] = None,
+                     stage: Optional[str] = None,
+                     model: Optional[str] = None,
+                     deadline: Optional[float] = None) -> Any:
+        """
+        Runs a chat completion. Returns a validated response_model instance
+        when one is given, otherwise the message content as a string.
+        Unless a model is given, the router picks one for the stage and
+        falls back to the next candidate if the call fails.
+        """
+        models = [model] if model else self.router.select(
+            stage, estimate_messages_tokens(messages))
+        for index, candidate in enumerate(models):
+            try:
+                return await self._create_with_model(stage, candidate,
+                                                     messages, response_model,
+                                                     deadline)
+            except Exception as e:
+                if index == len(models) - 1:
+                    raise
+                LLM_EVENTS.inc(event="fallback")
+                logfire.warn("Falling back to next model",
+                             stage=stage,
+                             model=candidate,
+                             fallback=models[index + 1],
+                             error=str(e))
+
+    async def stream(self,
+                     messages: List[Dict[str, str]],
+                     stage: Optional[str] = None,
+                     model: Optional[str] = None,
+                     deadline: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Streams the completion's content deltas as they arrive. A cached
+        response is yielded as a single chunk; only a stream that completed
+        normally is cached.
+        Streams are never hedged, and the deadline bounds time to the first
+        response rather than the whole stream.
+        """
+        model = model or self.router.select(
+            stage, estimate_messages_tokens(messages))[0]
+        key = None
+        if self.cache is not None:
+            key = self.cache_key(model, messages)
+            cached = await self.cache.get(key)
+            if cached is not None:
+                logfire.info("LLM cache hit", model=model)
+                yield cached
+                return
+
+        chunks = []
+        started = time.perf_counter()
+        try:
+            stream = await self._dispatch(messages,
+                                          deadline=deadline,
+                                          hedge=False,
+                                          model=model,
+                                          stream=True,
+                                          stream_options={"include_usage": True})
+        except Exception:
+            self._record_call(stage, model, started, ok=False)
+            raise
+        usage = None
+        try:
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    chunks.append(delta)
+                    yield delta
+        except Exception:
+            self._record_call(stage, model, started, ok=False)
+            raise
+        finally:
+            # Also runs when the consumer stops early (a client
+            # disconnect), so the provider's HTTP response is released
+            await stream.close()
+        self._record_call(stage, model, started, True, usage)
+
+        if key is not None and chunks:
+            await self.cache.set(key, "".join(chunks))
+
+    def cache_stats(self) -> Dict[str, int]:
+        return self.cache.stats() if self.cache is not None else {}
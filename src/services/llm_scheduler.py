@@ -0,0 +1,243 @@
+import asyncio
+import heapq
+import itertools
+import random
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional, Tuple
+import httpx
+import openai
+from src.utils.http_headers import header_int
+from src.utils.metrics import LLM_SCHEDULER_EVENTS, LLM_SCHEDULER_QUEUE
+from src.utils.priority import Priority, current_priority
+import logfire
+
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Parses OpenAI reset headers such as "1s", "6m0s" or "20ms" into seconds.
+    """
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+class TokenBucket:
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.level = capacity
+        self.updated_at = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        elapsed = now - self.updated_at
+        self.level = min(self.capacity,
+                         self.level + elapsed * self.refill_per_second)
+        self.updated_at = now
+
+    def time_until(self, amount: float, now: float) -> float:
+        self.refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.refill_per_second
+
+    def consume(self, amount: float) -> None:
+        self.level -= min(amount, self.capacity)
+
+    def limit_to(self, remaining: float, now: float) -> None:
+        self.refill(now)
+        self.level = min(self.level, remaining)
+
+
+class LLMScheduler:
+    """
+    Process-wide gate in front of every chat-completion call.
+
+    Calls wait for a concurrency slot and for room in request and token
+    buckets, in priority order. Rate-limit headers from responses shrink
+    the buckets to what the provider reports, and 429s or transient errors
+    are retried with jittered exponential backoff.
+    """
+
+    def __init__(self,
+                 requests_per_minute: int,
+                 tokens_per_minute: int,
+                 max_concurrency: int,
+                 max_retries: int = 5,
+                 base_backoff: float = 1.0,
+                 max_backoff: float = 60.0):
+        self.request_bucket = TokenBucket(requests_per_minute,
+                                          requests_per_minute / 60.0)
+        self.token_bucket = TokenBucket(tokens_per_minute,
+                                        tokens_per_minute / 60.0)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._waiters: List[Tuple[int, int]] = []
+        self._sequence = itertools.count()
+        self._condition: Optional[asyncio.Condition] = None
+        self.stats: Dict[str, int] = {
+            "dispatched": 0,
+            "rate_limited": 0,
+            "retries": 0,
+        }
+
+    @property
+    def condition(self) -> asyncio.Condition:
+        # Created lazily so the scheduler can be built outside an event loop
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _update_gauges(self) -> None:
+        LLM_SCHEDULER_QUEUE.set(len(self._waiters), state="queued")
+        LLM_SCHEDULER_QUEUE.set(self.in_flight, state="in_flight")
+
+    def _delay_for(self, tokens: int, now: float) -> float:
+        return max(self.paused_until - now,
+                   self.request_bucket.time_until(1, now),
+                   self.token_bucket.time_until(tokens, now))
+
+    async def acquire(self, tokens: int, priority: Priority) -> None:
+        entry = (int(priority), next(self._sequence))
+        async with self.condition:
+            heapq.heappush(self._waiters, entry)
+            self._update_gauges()
+            try:
+                while True:
+                    timeout = None
+                    if (self._waiters[0] == entry
+                            and self.in_flight < self.max_concurrency):
+                        now = time.monotonic()
+                        timeout = self._delay_for(tokens, now)
+                        if timeout <= 0:
+                            self.request_bucket.consume(1)
+                            self.token_bucket.consume(tokens)
+                            self.in_flight += 1
+                            self.stats["dispatched"] += 1
+                            LLM_SCHEDULER_EVENTS.inc(event="dispatched")
+                            heapq.heappop(self._waiters)
+                            self._update_gauges()
+                            self.condition.notify_all()
+                            return
+                    try:
+                        await asyncio.wait_for(self.condition.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+            except BaseException:
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                    self._update_gauges()
+                    self.condition.notify_all()
+                raise
+
+    async def release(self) -> None:
+        async with self.condition:
+            self.in_flight -= 1
+            self._update_gauges()
+            self.condition.notify_all()
+
+    def observe_headers(self, headers: Mapping[str, str]) -> None:
+        now = time.monotonic()
+        remaining_requests = header_int(headers,
+                                        "x-ratelimit-remaining-requests")
+        remaining_tokens = header_int(headers, "x-ratelimit-remaining-tokens")
+        if remaining_requests is not None:
+            self.request_bucket.limit_to(remaining_requests, now)
+            if remaining_requests == 0:
+                self.pause(
+                    parse_reset_duration(
+                        headers.get("x-ratelimit-reset-requests")))
+        if remaining_tokens is not None:
+            self.token_bucket.limit_to(remaining_tokens, now)
+            if remaining_tokens == 0:
+                self.pause(
+                    parse_reset_duration(
+                        headers.get("x-ratelimit-reset-tokens")))
+
+    def pause(self, seconds: Optional[float]) -> None:
+        if seconds:
+            self.paused_until = max(self.paused_until,
+                                    time.monotonic() + seconds)
+
+    async def on_response(self, response: httpx.Response) -> None:
+        """
+        httpx response hook that feeds rate-limit headers into the buckets.
+        """
+        self.observe_headers(response.headers)
+
+    def _retryable_error(self,
+                         error: BaseException) -> Optional[openai.APIError]:
+        # Instructor may wrap the underlying OpenAI error
+        seen = set()
+        while error is not None and id(error) not in seen:
+            seen.add(id(error))
+            if isinstance(error, (openai.RateLimitError,
+                                  openai.APIConnectionError,
+                                  openai.InternalServerError)):
+                return error
+            error = error.__cause__ or error.__context__
+        return None
+
+    def _backoff(self, attempt: int, error: openai.APIError) -> float:
+        delay = random.uniform(
+            0, min(self.max_backoff, self.base_backoff * 2**attempt))
+        response = getattr(error, "response", None)
+        if response is not None:
+            retry_after = parse_reset_duration(
+                response.headers.get("retry-after"))
+            if retry_after:
+                delay = max(delay, retry_after)
+        return delay
+
+    async def run(self,
+                  call: Callable[[], Awaitable[Any]],
+                  estimated_tokens: int,
+                  priority: Optional[Priority] = None) -> Any:
+        priority = priority if priority is not None else current_priority()
+        attempt = 0
+        while True:
+            await self.acquire(estimated_tokens, priority)
+            try:
+                return await call()
+            except Exception as e:
+                error = self._retryable_error(e)
+                if error is None or attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt, error)
+                if isinstance(error, openai.RateLimitError):
+                    self.stats["rate_limited"] += 1
+                    LLM_SCHEDULER_EVENTS.inc(event="rate_limited")
+                    self.observe_headers(error.response.headers)
+                    self.pause(delay)
+                self.stats["retries"] += 1
+                LLM_SCHEDULER_EVENTS.inc(event="retry")
+                logfire.warn("Retrying LLM call",
+                             attempt=attempt + 1,
+                             delay=round(delay, 2),
+                             error=str(error))
+            finally:
+                await self.release()
+            attempt += 1
+            await asyncio.sleep(delay)
@@ -0,0 +1,103 @@
+import time
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field
+
+# Pipeline stages that make LLM calls
+JOB_PARSE = "job_parse"
+LINKEDIN_PARSE = "linkedin_parse"
+EXISTING_RESUME_AGENT = "existing_resume_agent"
+LINKEDIN_AGENT = "linkedin_agent"
+AGGREGATOR = "aggregator"
+
+
+class ModelRoute(BaseModel):
+    model: str = Field(..., description="Primary model for the stage")
+    fallback_model: Optional[str] = Field(
+        None,
+        description="Model used when the primary is slow or erroring")
+    large_model: Optional[str] = Field(
+        None, description="Model used for prompts above max_prompt_tokens")
+    max_prompt_tokens: Optional[int] = Field(
+        None, description="Prompt size above which large_model is used")
+    latency_slo_seconds: Optional[float] = Field(
+        None,
+        description="Average latency above which the fallback is preferred")
+
+
+class ModelHealth:
+
+    def __init__(self):
+        self.average_latency: Optional[float] = None
+        self.consecutive_errors = 0
+        self.demoted_until = 0.0
+
+
+class ModelRouter:
+    """
+    Picks the model for each pipeline stage. A stage's primary model is
+    demoted behind its fallback while its smoothed latency exceeds the
+    stage's SLO or after repeated errors, until a cooldown expires.
+    """
+
+    def __init__(self,
+                 routes: Dict[str, ModelRoute],
+                 default_route: ModelRoute,
+                 error_threshold: int = 3,
+                 cooldown_seconds: float = 60.0,
+                 smoothing: float = 0.3):
+        self.routes = routes
+        self.default_route = default_route
+        self.error_threshold = error_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.smoothing = smoothing
+        self.health: Dict[str, ModelHealth] = {}
+
+    def route_for(self, stage: Optional[str]) -> ModelRoute:
+        return self.routes.get(stage, self.default_route)
+
+    def _is_healthy(self, model: str, route: ModelRoute) -> bool:
+        health = self.health.get(model)
+        if health is None:
+            return True
+        if time.monotonic() < health.demoted_until:
+            return False
+        if (route.latency_slo_seconds is not None
+                and health.average_latency is not None
+                and health.average_latency > route.latency_slo_seconds):
+            # Let one request through per cooldown to re-measure the model
+            health.demoted_until = time.monotonic() + self.cooldown_seconds
+            health.average_latency = None
+            return False
+        return True
+
+    def select(self, stage: Optional[str], prompt_tokens: int) -> List[str]:
+        """
+        Returns the models to try for a stage, in order.
+        """
+        route = self.route_for(stage)
+        primary = route.model
+        if (route.large_model and route.max_prompt_tokens is not None
+                and prompt_tokens > route.max_prompt_tokens):
+            primary = route.large_model
+
+        candidates = [primary]
+        if route.fallback_model and route.fallback_model != primary:
+            if self._is_healthy(primary, route):
+                candidates.append(route.fallback_model)
+            else:
+                candidates.insert(0, route.fallback_model)
+        return candidates
+
+    def record(self, model: str, latency: float, ok: bool) -> None:
+        health = self.health.setdefault(model, ModelHealth())
+        if ok:
+            health.consecutive_errors = 0
+            health.average_latency = (
+                latency if health.average_latency is None else
+                self.smoothing * latency +
+                (1 - self.smoothing) * health.average_latency)
+        else:
+            health.consecutive_errors += 1
+            if health.consecutive_errors >= self.error_threshold:
+                health.demoted_until = time.monotonic() + self.cooldown_seconds
+                health.consecutive_errors = 0
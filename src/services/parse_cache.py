@@ -0,0 +1,84 @@
+import hashlib
+import json
+import re
+from typing import Any, Optional, Type, TypeVar
+import logfire
+from pydantic import BaseModel, ValidationError
+from src.services.llm_gateway import response_model_schema
+from src.utils.tiered_cache import TieredCache
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+# Bump when the parse prompts change in a way that should invalidate
+# previously extracted models; schema changes are picked up automatically
+PARSE_CACHE_VERSION = 1
+
+# Scraper response fields that change between identical pages
+VOLATILE_KEYS = {"credits"}
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_scraped(value: Any) -> Any:
+    """
+    Canonical form of scraped JSON for hashing: volatile bookkeeping
+    fields dropped and runs of whitespace in strings collapsed.
+    """
+    if isinstance(value, dict):
+        return {
+            key: normalize_scraped(item)
+            for key, item in value.items() if key not in VOLATILE_KEYS
+        }
+    if isinstance(value, list):
+        return [normalize_scraped(item) for item in value]
+    if isinstance(value, str):
+        return _WHITESPACE.sub(" ", value).strip()
+    return value
+
+
+def content_hash(data: Any) -> str:
+    payload = json.dumps(normalize_scraped(data),
+                         sort_keys=True,
+                         separators=(",", ":"),
+                         ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def schema_version(response_model: Type[BaseModel]) -> str:
+    payload = f"{PARSE_CACHE_VERSION}:{response_model_schema(response_model)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class ParseCache:
+    """
+    Caches models extracted by the LLM from scraped pages, keyed by a hash
+    of the normalized scraped JSON and the response model's schema. An
+    unchanged page skips the extraction call, and changing the model's
+    fields invalidates its entries without a migration.
+    """
+
+    def __init__(self, cache: TieredCache):
+        self.cache = cache
+
+    def cache_key(self, data: Any, response_model: Type[BaseModel]) -> str:
+        return (f"{response_model.__name__}:{schema_version(response_model)}"
+                f":{content_hash(data)}")
+
+    async def get(self, data: Any,
+                  response_model: Type[ModelT]) -> Optional[ModelT]:
+        key = self.cache_key(data, response_model)
+        cached = await self.cache.get(key)
+        if cached is None:
+            return None
+        try:
+            return response_model.model_validate_json(cached)
+        except ValidationError as e:
+            logfire.warn("Discarding cached parse that no longer validates",
+                         model=response_model.__name__,
+                         error=str(e))
+            await self.cache.delete(key)
+            return None
+
+    async def set(self, data: Any, model: BaseModel) -> None:
+        await self.cache.set(self.cache_key(data, type(model)),
+                             model.model_dump_json())
@@ -0,0 +1,38 @@
+import hashlib
+from typing import Optional
+from src.models.resume import ResumeContent
+from src.utils.tiered_cache import TieredCache
+
+
+class StoredResume:
+
+    def __init__(self, resume_id: str, content: ResumeContent):
+        self.resume_id = resume_id
+        self.content = content
+
+    @property
+    def etag(self) -> str:
+        digest = hashlib.sha256(
+            self.content.markdown_content.encode("utf-8")).hexdigest()
+        return f'"{digest[:32]}"'
+
+
+class ResultStore:
+    """
+    Keeps generated resumes in a TieredCache, so results survive restarts
+    and are visible to every API worker and background worker sharing the
+    same database. Entries expire after the cache TTL and the oldest are
+    evicted once the byte cap is reached.
+    """
+
+    def __init__(self, cache: TieredCache):
+        self.cache = cache
+
+    async def put(self, resume_id: str, content: ResumeContent) -> None:
+        await self.cache.set(resume_id, content.markdown_content)
+
+    async def get(self, resume_id: str) -> Optional[StoredResume]:
+        markdown_content = await self.cache.get(resume_id)
+        if markdown_content is None:
+            return None
+        return StoredResume(resume_id, ResumeContent(markdown_content))
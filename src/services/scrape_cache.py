@@ -0,0 +1,121 @@
+import asyncio
+import hashlib
+import time
+from typing import Awaitable, Callable, Dict, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import logfire
+from src.utils.metrics import SCRAPE_CACHE_EVENTS
+from src.utils.tiered_cache import TieredCache
+
+ScrapeResult = Union[str, Dict[str, str]]
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = {
+    "trk", "trackingid", "refid", "lipi", "midtoken", "midsig", "trkemail",
+    "eid", "otptoken", "gclid", "fbclid", "mc_cid", "mc_eid", "gh_src"
+}
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form of a URL for cache keys: lower-cased scheme and host
+    without "www." or a default port, no fragment, tracking parameters
+    removed, remaining parameters sorted and no trailing slash.
+    """
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or "https").lower()
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    netloc = host
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{parts.port}"
+    query = sorted((key, value)
+                   for key, value in parse_qsl(parts.query,
+                                               keep_blank_values=True)
+                   if key.lower() not in TRACKING_PARAMS
+                   and not key.lower().startswith("utm_"))
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((scheme, netloc, path, urlencode(query), ""))
+
+
+class ScrapeCache:
+    """
+    Caches raw scraped pages by normalized URL with a TTL per source.
+
+    Once an entry is older than its source's TTL it is still served for up
+    to `stale_seconds` more, while a single background fetch refreshes it.
+    Only successful scrapes are cached.
+    """
+
+    def __init__(self,
+                 cache: TieredCache,
+                 ttl_seconds: Dict[str, float],
+                 stale_seconds: float = 0.0,
+                 default_ttl_seconds: float = 3600.0):
+        self.cache = cache
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.default_ttl_seconds = default_ttl_seconds
+        self._revalidating: Dict[str, "asyncio.Task[None]"] = {}
+
+    def cache_key(self, source: str, url: str) -> str:
+        digest = hashlib.sha256(normalize_url(url).encode("utf-8"))
+        return f"{source}:{digest.hexdigest()}"
+
+    def ttl_for(self, source: str) -> float:
+        return self.ttl_seconds.get(source, self.default_ttl_seconds)
+
+    async def _store(self, key: str, source: str, result: ScrapeResult) -> None:
+        if isinstance(result, str):
+            await self.cache.set(key,
+                                 result,
+                                 ttl_seconds=self.ttl_for(source) +
+                                 self.stale_seconds)
+
+    async def _revalidate(self, key: str, source: str, url: str,
+                          fetch: Callable[[], Awaitable[ScrapeResult]]) -> None:
+        try:
+            result = await fetch()
+            await self._store(key, source, result)
+            SCRAPE_CACHE_EVENTS.inc(source=source,
+                                    event="revalidated" if isinstance(
+                                        result, str) else "revalidate_failed")
+        except Exception as e:
+            SCRAPE_CACHE_EVENTS.inc(source=source, event="revalidate_failed")
+            logfire.warn("Failed to revalidate cached scrape",
+                         url=url,
+                         error=str(e))
+        finally:
+            self._revalidating.pop(key, None)
+
+    async def fetch(self,
+                    source: str,
+                    url: str,
+                    fetch: Callable[[], Awaitable[ScrapeResult]],
+                    bypass: bool = False) -> ScrapeResult:
+        """
+        Returns the cached page for `url` when there is one, calling
+        `fetch` on a miss. With `bypass` the cache is not read, but a
+        successful result still replaces the cached page.
+        """
+        key = self.cache_key(source, url)
+        if bypass:
+            SCRAPE_CACHE_EVENTS.inc(source=source, event="bypass")
+        else:
+            entry = await self.cache.get_entry(key)
+            if entry is not None:
+                if time.time() - entry.created_at < self.ttl_for(source):
+                    SCRAPE_CACHE_EVENTS.inc(source=source, event="fresh")
+                    return entry.value
+                SCRAPE_CACHE_EVENTS.inc(source=source, event="stale")
+                if key not in self._revalidating:
+                    self._revalidating[key] = asyncio.create_task(
+                        self._revalidate(key, source, url, fetch))
+                return entry.value
+            SCRAPE_CACHE_EVENTS.inc(source=source, event="miss")
+
+        result = await fetch()
+        await self._store(key, source, result)
+        return result
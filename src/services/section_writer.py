@@ -0,0 +1,138 @@
+import asyncio
+import time
+from typing import AsyncIterator, Dict, List, Optional
+import logfire
+from src.models.resume import ResumeOutline
+from src.services.llm_gateway import LLMGateway
+from src.utils.metrics import RESUME_SECTION_SECONDS
+
+# (outline field, Markdown heading, what the section should contain), in
+# the order the sections appear in the resume
+RESUME_SECTIONS = [
+    ("summary", "Summary",
+     "Two to four sentences positioning the candidate for this job."),
+    ("experience", "Experience",
+     "One '### Title — Company (start – end)' entry per planned position, "
+     "each followed by bullets that start with action verbs and quantify "
+     "achievements where possible."),
+    ("skills", "Skills",
+     "The planned skills as a comma-separated list or short grouped "
+     "lines."),
+    ("projects", "Projects",
+     "One '### Project name' entry per planned project with one to three "
+     "bullets."),
+    ("education", "Education",
+     "One line per degree or certification with the institution and "
+     "dates."),
+]
+
+OUTLINE_PROMPT = """
+Before writing, plan the resume described above. Fill in the outline: the
+candidate's name and contact line, the job requirements to emphasize, and
+for each section the points it should cover, most relevant to the job
+first. Leave a section empty if the candidate has nothing relevant for
+it. Keep each point to a few words: this call runs before any section
+is written, so its length adds directly to the latency.
+"""
+
+
+def section_prompt(outline: ResumeOutline, heading: str,
+                   instructions: str) -> str:
+    return f"""
+Write only the {heading} section of the resume described above, following
+this outline of the whole resume:
+
+{outline.model_dump_json(indent=2)}
+
+{instructions}
+
+Start with the heading `## {heading}`. Do not write any other section or
+the candidate's name, and do not add commentary. Respond in Markdown.
+"""
+
+
+class SectionWriter:
+    """
+    Writes a resume as an outline followed by one LLM call per section,
+    run concurrently, instead of one long completion. Every call shares
+    the agent's messages as its prompt prefix, so the provider's prompt
+    cache covers all but the section instructions.
+    """
+
+    def __init__(self, llm_gateway: LLMGateway):
+        self.llm_gateway = llm_gateway
+
+    async def outline(self, messages: List[Dict[str, str]],
+                      stage: Optional[str]) -> ResumeOutline:
+        started = time.perf_counter()
+        outline = await self.llm_gateway.create(
+            messages=messages + [{
+                "role": "user",
+                "content": OUTLINE_PROMPT
+            }],
+            response_model=ResumeOutline,
+            stage=stage)
+        RESUME_SECTION_SECONDS.observe(time.perf_counter() - started,
+                                       stage=stage or "unknown",
+                                       section="outline")
+        return outline
+
+    async def write_section(self, messages: List[Dict[str, str]],
+                            stage: Optional[str], outline: ResumeOutline,
+                            section: str, heading: str,
+                            instructions: str) -> str:
+        started = time.perf_counter()
+        content = await self.llm_gateway.create(
+            messages=messages + [{
+                "role": "user",
+                "content": section_prompt(outline, heading, instructions)
+            }],
+            stage=stage)
+        RESUME_SECTION_SECONDS.observe(time.perf_counter() - started,
+                                       stage=stage or "unknown",
+                                       section=section)
+        content = (content or "").strip()
+        if not content.startswith("#"):
+            content = f"## {heading}\n\n{content}"
+        return content
+
+    @staticmethod
+    def header(outline: ResumeOutline) -> str:
+        header = f"# {outline.candidate_name}"
+        if outline.contact_line:
+            header += f"\n\n{outline.contact_line}"
+        return header
+
+    async def stream(self, messages: List[Dict[str, str]],
+                     stage: Optional[str]) -> AsyncIterator[str]:
+        """
+        Generates the resume for an agent's prompt `messages`, yielding
+        the header and then each section in resume order as soon as it
+        and the sections before it are written. Sections the outline
+        leaves empty are not written.
+        """
+        outline = await self.outline(messages, stage)
+        planned = [(section, heading, instructions)
+                   for section, heading, instructions in RESUME_SECTIONS
+                   if getattr(outline, section)]
+        tasks = [
+            asyncio.ensure_future(
+                self.write_section(messages, stage, outline, section,
+                                   heading, instructions))
+            for section, heading, instructions in planned
+        ]
+        try:
+            yield self.header(outline)
+            for task in tasks:
+                yield "\n\n" + await task
+            yield "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+        logfire.info("Generated resume in sections",
+                     stage=stage,
+                     sections=[section for section, _, _ in planned])
+
+    async def write(self, messages: List[Dict[str, str]],
+                    stage: Optional[str]) -> str:
+        return "".join([chunk async for chunk in self.stream(messages, stage)])
@@ -2,17 +2,45 @@ from openai import AsyncOpenAI
 import json
 import aiohttp
 import logfire
-from typing import Dict, Any, Union
+from typing import Awaitable, Callable, Dict, Any, List, Optional, Union
+from pydantic import BaseModel
 from src.models.job import JobInformation
 from src.models.linkedin import LinkedInProfile
+from src.services.http_client import HttpClient
+from src.services.llm_gateway import LLMGateway
+from src.services.model_router import JOB_PARSE, LINKEDIN_PARSE
+from src.services.parse_cache import ParseCache
+from src.services.scrape_cache import ScrapeCache, normalize_url
+from src.utils.job_posting_extractor import (LLM, JobExtraction,
+                                             extract_job_posting,
+                                             job_fields_model)
+from src.utils.metrics import (JOB_EXTRACTION_FIELDS, JOB_EXTRACTIONS,
+                               SCRAPE_SECONDS)
+from src.utils.single_flight import SingleFlight
+
+SERPER_SCRAPE_URL = "https://scrape.serper.dev"
 
 
 class WebScraper:
 
-    def __init__(self, api_key: str, llm_client: AsyncOpenAI):
+    def __init__(self,
+                 api_key: str,
+                 llm_client: AsyncOpenAI,
+                 llm_gateway: Optional[LLMGateway] = None,
+                 base_url: str = SERPER_SCRAPE_URL,
+                 http_client: Optional[HttpClient] = None,
+                 scrape_cache: Optional[ScrapeCache] = None,
+                 parse_cache: Optional[ParseCache] = None):
         self.api_key = api_key
-        self.base_url = "https://scrape.serper.dev"
+        self.base_url = base_url
+        self.http_client = http_client or HttpClient()
+        self.scrape_cache = scrape_cache
+        self.parse_cache = parse_cache
+        # Concurrent requests for the same page share one fetch and parse
+        self.job_flights = SingleFlight("job")
+        self.linkedin_flights = SingleFlight("linkedin")
         self.llm_client = llm_client
+        self.llm_gateway = llm_gateway or LLMGateway(llm_client)
 
     async def fetch_data(self, url: str) -> Union[str, Dict[str, str]]:
         """
@@ -25,20 +53,19 @@ class WebScraper:
         payload = json.dumps({"url": url})
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self.base_url,
-                                        headers=headers,
-                                        data=payload) as response:
-                    if response.status == 200:
-                        return await response.text()
-                    else:
-                        logfire.error("Failed to fetch data",
-                                      url=url,
-                                      status=response.status)
-                        return {
-                            "error":
-                            f"Failed to fetch data. Status: {response.status}"
-                        }
+            async with self.http_client.session.post(
+                    self.base_url, headers=headers, data=payload) as response:
+                if response.status == 200:
+                    return await response.text()
+                else:
+                    logfire.error("Failed to fetch data",
+                                  url=url,
+                                  status=response.status)
+                    return {
+                        "error":
+                        f"Failed to fetch data. Status: {response.status}",
+                        "status": response.status,
+                    }
         except aiohttp.ClientError as client_error:
             logfire.error("HTTP request failed",
                           url=url,
@@ -80,6 +107,32 @@ class WebScraper:
         qualifications, and benefits if available.
         """
 
+    def construct_job_fields_prompt(self, data: Dict[str, Any],
+                                    extraction: JobExtraction,
+                                    fields: List[str]) -> str:
+        """
+        Constructs a prompt for the LLM to fill only the job information
+        fields that could not be extracted from structured data.
+        """
+        known = {
+            field: value
+            for field, value in extraction.values.items()
+            if field != "full_description"
+        }
+        return f"""
+        Parse the following job description data and extract only these fields: {", ".join(fields)}.
+
+        These fields were already extracted from the posting; keep your answer consistent with them:
+
+        {json.dumps(known, indent=2)}
+
+        Job description data:
+
+        {json.dumps(data, indent=2)}
+
+        If a requested field is not available, use null or an empty list as appropriate.
+        """
+
     def construct_linkedin_prompt(self, data: Dict[str, Any]) -> str:
         """
         Constructs a prompt for the LLM to parse LinkedIn profile data.
@@ -109,14 +162,17 @@ class WebScraper:
         If any information is not available, use null or an empty list as appropriate.
         """
 
-    async def query_llm(self, prompt: str,
-                        response_model: Any) -> Union[Any, Dict[str, str]]:
+    async def query_llm(
+            self,
+            prompt: str,
+            response_model: Any,
+            stage: Optional[str] = None) -> Union[Any, Dict[str, str]]:
         """
         Queries the LLM with the given prompt and returns the parsed information.
         """
         try:
-            return await self.llm_client.chat.completions.create(
-                model="gpt-4",
+            return await self.llm_gateway.create(
+                stage=stage,
                 response_model=response_model,
                 messages=[
                     {
@@ -135,12 +191,51 @@ class WebScraper:
             logfire.error("Failed to query LLM", error=str(e))
             return {"error": f"Failed to parse information: {str(e)}"}
 
-    async def fetch_job_description(self,
-                                    url: str) -> Union[str, Dict[str, str]]:
+    async def extract(
+        self, data: Dict[str, Any], response_model: Any,
+        parse: Callable[[], Awaitable[Union[Any, Dict[str, str]]]]
+    ) -> Union[Any, Dict[str, str]]:
+        """
+        Extracts a model from scraped data with `parse`, reusing the
+        previous result when the same content was parsed before.
+        """
+        if self.parse_cache is not None:
+            cached = await self.parse_cache.get(data, response_model)
+            if cached is not None:
+                logfire.info("Reusing parsed model for unchanged content",
+                             model=response_model.__name__)
+                return cached
+        result = await parse()
+        if self.parse_cache is not None and isinstance(result, BaseModel):
+            await self.parse_cache.set(data, result)
+        return result
+
+    async def fetch_cached(self, source: str, url: str,
+                           bypass_cache: bool) -> Union[str, Dict[str, str]]:
+        """
+        Fetches raw data for the given URL through the scrape cache, when
+        one is configured.
+        """
+
+        async def fetch() -> Union[str, Dict[str, str]]:
+            with SCRAPE_SECONDS.time(source=source):
+                return await self.fetch_data(url)
+
+        if self.scrape_cache is None:
+            return await fetch()
+        return await self.scrape_cache.fetch(source,
+                                             url,
+                                             fetch,
+                                             bypass=bypass_cache)
+
+    async def fetch_job_description(
+            self,
+            url: str,
+            bypass_cache: bool = False) -> Union[str, Dict[str, str]]:
         """
         Fetches the job description data from the given URL.
         """
-        result = await self.fetch_data(url)
+        result = await self.fetch_cached("job", url, bypass_cache)
         if isinstance(result, dict) and "error" in result:
             return result
         logfire.info("Successfully fetched job description", url=url)
@@ -157,25 +252,91 @@ class WebScraper:
         logfire.info("Successfully parsed job description JSON")
         return result
 
+    def record_job_extraction(self, extraction: JobExtraction,
+                              path: str) -> None:
+        field_sources = extraction.field_sources()
+        JOB_EXTRACTIONS.inc(path=path)
+        for field, source in field_sources.items():
+            JOB_EXTRACTION_FIELDS.inc(field=field, source=source)
+        logfire.info("Extracted job information",
+                     path=path,
+                     field_sources=field_sources)
+
+    async def complete_job_information(
+            self, data: Dict[str, Any], extraction: JobExtraction
+    ) -> Union[JobInformation, Dict[str, str]]:
+        """
+        Asks the LLM for the fields the rule-based extractor left empty
+        and merges them into the extraction.
+        """
+        fields = extraction.missing()
+        path = "rules_and_llm" if extraction.values else "llm"
+        if extraction.values:
+            prompt = self.construct_job_fields_prompt(data, extraction, fields)
+            response_model = job_fields_model(tuple(fields))
+        else:
+            prompt = self.construct_job_prompt(data)
+            response_model = JobInformation
+        result = await self.query_llm(prompt, response_model, JOB_PARSE)
+        if isinstance(result, dict) and "error" in result:
+            return result
+        extraction.merge(result.model_dump(), LLM)
+        try:
+            job_information = extraction.build()
+        except ValueError as e:
+            logfire.error("LLM did not fill the missing job fields",
+                          fields=fields,
+                          error=str(e))
+            return {"error": f"Failed to parse information: {str(e)}"}
+        self.record_job_extraction(extraction, path)
+        return job_information
+
     async def process_job_description(
             self, data: Dict[str,
                              Any]) -> Union[JobInformation, Dict[str, str]]:
         """
-        Processes the structured job description data through the LLM.
+        Extracts job information from the structured job description data,
+        using the LLM only for fields the posting's structured data and
+        text do not provide.
         """
-        prompt = self.construct_job_prompt(data)
-        result = await self.query_llm(prompt, JobInformation)
+        extraction = extract_job_posting(data)
+        if not extraction.needs_llm():
+            self.record_job_extraction(extraction, "rules")
+            logfire.info("Extracted job description without the LLM")
+            return extraction.build()
+
+        parsed = False
+
+        async def parse() -> Union[JobInformation, Dict[str, str]]:
+            nonlocal parsed
+            parsed = True
+            return await self.complete_job_information(data, extraction)
+
+        result = await self.extract(data, JobInformation, parse)
         if isinstance(result, dict) and "error" in result:
             return result
+        if not parsed:
+            JOB_EXTRACTIONS.inc(path="cached")
         logfire.info("Successfully processed job description through LLM")
         return result
 
     async def fetch_and_parse_job_description(
-            self, url: str) -> Union[JobInformation, Dict[str, str]]:
+            self,
+            url: str,
+            bypass_cache: bool = False
+    ) -> Union[JobInformation, Dict[str, str]]:
         """
         Orchestrates the process of fetching, parsing, and processing a job description.
+        Concurrent calls for the same URL share a single fetch and parse.
         """
-        fetched_data = await self.fetch_job_description(url)
+        return await self.job_flights.run(
+            (normalize_url(url), bypass_cache),
+            lambda: self._fetch_and_parse_job_description(url, bypass_cache))
+
+    async def _fetch_and_parse_job_description(
+            self, url: str,
+            bypass_cache: bool) -> Union[JobInformation, Dict[str, str]]:
+        fetched_data = await self.fetch_job_description(url, bypass_cache)
         if isinstance(fetched_data, dict) and "error" in fetched_data:
             return fetched_data
 
@@ -185,12 +346,14 @@ class WebScraper:
 
         return await self.process_job_description(parsed_data)
 
-    async def fetch_linkedin_profile(self,
-                                     url: str) -> Union[str, Dict[str, str]]:
+    async def fetch_linkedin_profile(
+            self,
+            url: str,
+            bypass_cache: bool = False) -> Union[str, Dict[str, str]]:
         """
         Fetches the LinkedIn profile data from the given URL.
         """
-        result = await self.fetch_data(url)
+        result = await self.fetch_cached("linkedin", url, bypass_cache)
         if isinstance(result, dict) and "error" in result:
             return result
         logfire.info("Successfully fetched LinkedIn profile", url=url)
@@ -213,19 +376,32 @@ class WebScraper:
         """
         Processes the structured LinkedIn profile data through the LLM.
         """
-        prompt = self.construct_linkedin_prompt(data)
-        result = await self.query_llm(prompt, LinkedInProfile)
+        result = await self.extract(
+            data, LinkedInProfile, lambda: self.query_llm(
+                self.construct_linkedin_prompt(data), LinkedInProfile,
+                LINKEDIN_PARSE))
         if isinstance(result, dict) and "error" in result:
             return result
         logfire.info("Successfully processed LinkedIn profile through LLM")
         return result
 
     async def fetch_and_parse_linkedin_profile(
-            self, url: str) -> Union[LinkedInProfile, Dict[str, str]]:
+            self,
+            url: str,
+            bypass_cache: bool = False
+    ) -> Union[LinkedInProfile, Dict[str, str]]:
         """
         Orchestrates the process of fetching, parsing, and processing a LinkedIn profile.
+        Concurrent calls for the same URL share a single fetch and parse.
         """
-        fetched_data = await self.fetch_linkedin_profile(url)
+        return await self.linkedin_flights.run(
+            (normalize_url(url), bypass_cache),
+            lambda: self._fetch_and_parse_linkedin_profile(url, bypass_cache))
+
+    async def _fetch_and_parse_linkedin_profile(
+            self, url: str,
+            bypass_cache: bool) -> Union[LinkedInProfile, Dict[str, str]]:
+        fetched_data = await self.fetch_linkedin_profile(url, bypass_cache)
         if isinstance(fetched_data, dict) and "error" in fetched_data:
             return fetched_data
 
@@ -1,69 +1,194 @@
-from typing import Any, Dict, List
+from collections.abc import Mapping
+from functools import cached_property
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+import asyncio
 import json
-import aiohttp
 import logfire
+from src.services.http_client import HttpClient
+from src.utils.metrics import SEARCH_QUERIES
+from src.utils.tiered_cache import TieredCache
+
+SERPER_SEARCH_URL = "https://google.serper.dev/search"
+# Serper accepts up to 100 queries in one batched request
+SERPER_MAX_BATCH = 100
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.split()).casefold()
+
+
+class SearchResults(Mapping):
+    """
+    Parsed view over a raw Serper response. The organic results, images
+    and summary are only built when first read.
+    """
+
+    KEYS = ("organic_results", "images", "summary")
+
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+
+    @cached_property
+    def organic_results(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "title": result.get("title"),
+                "link": result.get("link"),
+                "snippet": result.get("snippet"),
+            }
+            for result in self.data.get("organic", [])
+        ]
+
+    @cached_property
+    def images(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "title": image.get("title"),
+                "imageUrl": image.get("imageUrl"),
+                "link": image.get("link"),
+            }
+            for image in self.data.get("images", [])
+        ]
+
+    @cached_property
+    def summary(self) -> str:
+        return WebSearcher.generate_summary(self.organic_results)
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.KEYS)
+
+    def __len__(self) -> int:
+        return len(self.KEYS)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self)
+
+
+SearchResult = Union[SearchResults, Dict[str, str]]
 
 
 class WebSearcher:
-    def __init__(self, api_key: str):
+    """
+    Serper web search. `search_many` sends queries in batched requests
+    (or one request per query when `batch` is off), at most
+    `max_concurrency` requests at a time, and caches raw results by
+    normalized query.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = SERPER_SEARCH_URL,
+        http_client: Optional[HttpClient] = None,
+        cache: Optional[TieredCache] = None,
+        batch: bool = True,
+        batch_size: int = SERPER_MAX_BATCH,
+        max_concurrency: int = 4,
+    ):
         self.api_key = api_key
-        self.base_url = "https://google.serper.dev/search"
+        self.base_url = base_url
+        self.http_client = http_client or HttpClient()
+        self.cache = cache
+        self.batch = batch
+        self.batch_size = min(batch_size, SERPER_MAX_BATCH)
+        self.max_concurrency = max_concurrency
+
+    async def search(self, query: str) -> SearchResult:
+        return (await self.search_many([query]))[0]
 
-    async def search(self, query: str) -> Dict[str, Any]:
+    async def post(self, payload: Any) -> Union[Any, Dict[str, str]]:
         headers = {"X-API-KEY": self.api_key, "Content-Type": "application/json"}
-        payload = json.dumps({"q": query})
-
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(
-                    self.base_url, headers=headers, data=payload
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        logfire.info(f"Successfully performed web search for {query}")
-                        return self.parse_search_results(data)
-                    else:
-                        logfire.error(
-                            f"Failed to perform web search for {query}. Status: {response.status}"
-                        )
-                        return {
-                            "error": f"Failed to perform web search. Status: {response.status}"
-                        }
-            except Exception as e:
+        try:
+            async with self.http_client.session.post(
+                self.base_url, headers=headers, data=json.dumps(payload)
+            ) as response:
+                if response.status == 200:
+                    return await response.json()
                 logfire.error(
-                    f"Exception occurred while performing web search for {query}: {e}"
+                    f"Failed to perform web search. Status: {response.status}"
                 )
-                return {"error": f"Exception occurred: {str(e)}"}
+                return {
+                    "error": f"Failed to perform web search. Status: {response.status}"
+                }
+        except Exception as e:
+            logfire.error(f"Exception occurred while performing web search: {e}")
+            return {"error": f"Exception occurred: {str(e)}"}
 
-    def parse_search_results(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        parsed_results = {"organic_results": [], "images": [], "summary": ""}
+    async def fetch_batch(self, queries: Sequence[str]) -> List[Dict[str, Any]]:
+        """
+        Raw results for `queries`, in order, from one batched request or
+        a single-query request.
+        """
+        if self.batch and len(queries) > 1:
+            data = await self.post([{"q": query} for query in queries])
+            if isinstance(data, list) and len(data) == len(queries):
+                return data
+            if not (isinstance(data, dict) and "error" in data):
+                data = {"error": "Unexpected response to batched web search"}
+            return [data] * len(queries)
+        return [await self.post({"q": queries[0]})]
 
-        for result in data.get("organic", []):
-            parsed_results["organic_results"].append(
-                {
-                    "title": result.get("title"),
-                    "link": result.get("link"),
-                    "snippet": result.get("snippet"),
-                }
-            )
-
-        for image in data.get("images", []):
-            parsed_results["images"].append(
-                {
-                    "title": image.get("title"),
-                    "imageUrl": image.get("imageUrl"),
-                    "link": image.get("link"),
-                }
-            )
+    async def search_many(self, queries: Iterable[str]) -> List[SearchResult]:
+        """
+        Searches every query, returning results in the same order. Repeated
+        queries (after normalization) are searched once, and cached results
+        are reused.
+        """
+        queries = list(queries)
+        keys = [normalize_query(query) for query in queries]
+        raw: Dict[str, Dict[str, Any]] = {}
+
+        if self.cache is not None:
+            for key in dict.fromkeys(keys):
+                cached = await self.cache.get(key)
+                if cached is not None:
+                    raw[key] = json.loads(cached)
+        SEARCH_QUERIES.inc(len(raw), result="cached")
+
+        first_query: Dict[str, str] = {}
+        for key, query in zip(keys, queries):
+            first_query.setdefault(key, query)
+        misses = [key for key in dict.fromkeys(keys) if key not in raw]
+        size = self.batch_size if self.batch else 1
+        chunks = [misses[start:start + size] for start in range(0, len(misses), size)]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(chunk: List[str]) -> None:
+            async with semaphore:
+                results = await self.fetch_batch([first_query[key] for key in chunk])
+            for key, data in zip(chunk, results):
+                raw[key] = data
+                if "error" in data:
+                    SEARCH_QUERIES.inc(result="error")
+                    continue
+                SEARCH_QUERIES.inc(result="fetched")
+                if self.cache is not None:
+                    await self.cache.set(key, json.dumps(data))
 
-        parsed_results["summary"] = self.generate_summary(
-            parsed_results["organic_results"]
+        await asyncio.gather(*(run(chunk) for chunk in chunks))
+        logfire.info(
+            "Performed web searches",
+            queries=len(queries),
+            fetched=len(misses),
+            requests=len(chunks),
         )
+        return [
+            raw[key] if "error" in raw[key] else self.parse_search_results(raw[key])
+            for key in keys
+        ]
 
-        return parsed_results
+    def parse_search_results(self, data: Dict[str, Any]) -> SearchResults:
+        return SearchResults(data)
 
-    def generate_summary(self, organic_results: List[Dict[str, str]]) -> str:
+    @staticmethod
+    def generate_summary(organic_results: Iterable[Dict[str, str]]) -> str:
         summary = "Based on the search results:\n"
-        for i, result in enumerate(organic_results[:3]):
+        for i, result in enumerate(islice(organic_results, 3)):
             summary += f"{i+1}. {result['title']}: {result['snippet']}\n"
         return summary
@@ -0,0 +1,37 @@
+import json
+from typing import Any
+from pydantic import BaseModel
+
+
+def prune_empty(value: Any) -> Any:
+    """
+    Recursively drops None, empty strings and empty collections, which
+    only add tokens to a prompt.
+    """
+    if isinstance(value, dict):
+        pruned = {key: prune_empty(item) for key, item in value.items()}
+        return {
+            key: item
+            for key, item in pruned.items()
+            if item not in (None, "", [], {})
+        }
+    if isinstance(value, list):
+        pruned = [prune_empty(item) for item in value]
+        return [item for item in pruned if item not in (None, "", [], {})]
+    return value
+
+
+def encode_for_prompt(value: Any) -> str:
+    """
+    Serializes a context source once into compact JSON for prompts.
+
+    Pydantic models go through pydantic-core's model_dump_json, skipping
+    None and default-valued (empty) fields; plain data is pruned the same
+    way and dumped without indentation.
+    """
+    if isinstance(value, BaseModel):
+        return value.model_dump_json(exclude_none=True, exclude_defaults=True)
+    return json.dumps(prune_empty(value),
+                      separators=(",", ":"),
+                      ensure_ascii=False,
+                      default=str)
@@ -0,0 +1,200 @@
+import re
+from typing import Any, Dict, FrozenSet, List, Optional
+from pydantic import BaseModel
+from src.utils.context_encoder import encode_for_prompt, prune_empty
+from src.utils.tokens import estimate_tokens
+
+# Sections that may be trimmed to fit a budget, in the order they win ties
+LINKEDIN_SECTIONS = ["experience", "skills", "projects"]
+GITHUB_SECTIONS = ["repos"]
+
+_WORD = re.compile(r"[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9]+)*")
+_STOPWORDS = frozenset("""
+    a an and are as at be by for from has have in is it of on or our the to
+    with we you your will this that who what years year experience ability
+    strong work working team teams plus including using etc
+    """.split())
+
+
+def relevance_terms(text: str) -> FrozenSet[str]:
+    return frozenset(word for word in _WORD.findall(text.lower())
+                     if word not in _STOPWORDS and len(word) > 1)
+
+
+def job_terms(job_information: Any) -> FrozenSet[str]:
+    """
+    Terms that make a candidate item relevant: the job's requirements,
+    qualifications and title.
+    """
+    if job_information is None:
+        return frozenset()
+    texts = [getattr(job_information, "title", "") or ""]
+    texts.extend(getattr(job_information, "requirements", None) or [])
+    texts.extend(getattr(job_information, "qualifications", None) or [])
+    return relevance_terms(" ".join(texts))
+
+
+class ContextItem:
+    """
+    One droppable entry (a position, skill, project or repo), encoded once.
+    """
+
+    def __init__(self, section: str, index: int, label: str, value: Any,
+                 tie_breaker: float = 0.0):
+        self.section = section
+        self.index = index
+        self.label = label
+        self.json = encode_for_prompt(value)
+        # +1 for the separating comma
+        self.tokens = estimate_tokens(self.json) + 1
+        self.terms = relevance_terms(self.json)
+        self.tie_breaker = tie_breaker
+
+
+class ContextSource:
+    """
+    A context source split into the fields that are always sent and lists
+    of items that can be dropped, all pre-encoded so a candidate can be
+    packed against many job postings without re-serializing.
+    """
+
+    def __init__(self, fixed: Any, items: Dict[str, List[ContextItem]]):
+        self.fixed_json = encode_for_prompt(fixed)
+        self.fixed_tokens = estimate_tokens(self.fixed_json)
+        self.items = items
+
+    def render(self, kept: Dict[str, List[ContextItem]]) -> str:
+        if self.fixed_json == "null":
+            return self.fixed_json
+        parts = [
+            f'"{section}":[{",".join(item.json for item in section_items)}]'
+            for section, section_items in kept.items() if section_items
+        ]
+        if not parts:
+            return self.fixed_json
+        if self.fixed_json == "{}":
+            return "{" + ",".join(parts) + "}"
+        return self.fixed_json[:-1] + "," + ",".join(parts) + "}"
+
+
+def _position_label(position: Dict[str, Any]) -> str:
+    return f"{position.get('title')} at {position.get('company')}"
+
+
+def linkedin_source(linkedin_profile: Any) -> ContextSource:
+    if linkedin_profile is None:
+        return ContextSource(None, {})
+    if isinstance(linkedin_profile, BaseModel):
+        data = linkedin_profile.model_dump(mode="json",
+                                           exclude_none=True,
+                                           exclude_defaults=True)
+    else:
+        data = dict(linkedin_profile)
+    labels = {
+        "experience": _position_label,
+        "skills": lambda skill: str(skill.get("name")),
+        "projects": lambda project: str(project.get("name")),
+    }
+    items = {
+        section: [
+            ContextItem(section, index, labels[section](value), value)
+            for index, value in enumerate(data.pop(section, None) or [])
+        ]
+        for section in LINKEDIN_SECTIONS
+    }
+    return ContextSource(data, items)
+
+
+def github_source(github_info: Optional[Dict[str, Any]]) -> ContextSource:
+    if github_info is None:
+        return ContextSource(None, {})
+    data = dict(prune_empty(github_info))
+    repos = data.pop("repos", None) or []
+    # Among equally relevant repos, prefer the more popular ones
+    items = {
+        "repos": [
+            ContextItem("repos", index, str(repo.get("name")), repo,
+                        -(repo.get("stars") or 0))
+            for index, repo in enumerate(repos)
+        ]
+    }
+    return ContextSource(data, items)
+
+
+class PackedContext:
+
+    def __init__(self, job_json: str, linkedin_json: str, github_json: str,
+                 budget: int, tokens: int, dropped: Dict[str, List[str]]):
+        self.job_json = job_json
+        self.linkedin_json = linkedin_json
+        self.github_json = github_json
+        self.budget = budget
+        self.tokens = tokens
+        self.dropped = dropped
+
+    def prompt_fields(self) -> Dict[str, str]:
+        return {
+            "job_json": self.job_json,
+            "linkedin_json": self.linkedin_json,
+            "github_json": self.github_json,
+        }
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "budget": self.budget,
+            "tokens": self.tokens,
+            "dropped": {
+                section: len(labels)
+                for section, labels in self.dropped.items()
+            },
+            "dropped_items": self.dropped,
+        }
+
+
+def pack_context(job_information: Any, job_json: str,
+                 linkedin: ContextSource, github: ContextSource,
+                 budget: int) -> PackedContext:
+    """
+    Fills `budget` tokens with the job description, each source's fixed
+    fields and then the droppable items most relevant to the job.
+
+    Items are ranked by how many of the job's requirement, qualification
+    and title terms they mention. Kept items stay in their original order,
+    so a candidate whose context fits the budget renders identically for
+    every job.
+    """
+    sources = [linkedin, github]
+    terms = job_terms(job_information)
+    used = estimate_tokens(job_json) + sum(source.fixed_tokens
+                                           for source in sources)
+    section_order = {
+        section: position
+        for position, section in enumerate(LINKEDIN_SECTIONS +
+                                           GITHUB_SECTIONS)
+    }
+    candidates = [
+        item for source in sources for section_items in source.items.values()
+        for item in section_items
+    ]
+    candidates.sort(key=lambda item: (-len(item.terms & terms),
+                                      section_order.get(item.section, 0),
+                                      item.tie_breaker, item.index))
+
+    kept_ids = set()
+    dropped: Dict[str, List[str]] = {}
+    for item in candidates:
+        if used + item.tokens <= budget:
+            kept_ids.add(id(item))
+            used += item.tokens
+        else:
+            dropped.setdefault(item.section, []).append(item.label)
+
+    def render(source: ContextSource) -> str:
+        return source.render({
+            section:
+            [item for item in section_items if id(item) in kept_ids]
+            for section, section_items in source.items.items()
+        })
+
+    return PackedContext(job_json, render(linkedin), render(github), budget,
+                         used, dropped)
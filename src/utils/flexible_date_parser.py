@@ -1,18 +1,143 @@
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import date
+from functools import lru_cache
+from re import Match
+from typing import Annotated, Any, Callable, Iterator, List, Optional, Tuple
+from pydantic import BeforeValidator, TypeAdapter, ValidationError
+from src.utils.metrics import DATE_PARSES
 
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12
+}
+SEASONS = {"spring": 3, "summer": 6, "fall": 9, "autumn": 9, "winter": 12}
 
-def flexible_date_parser(value):
+# Values that mean "still ongoing" or "unknown"; both parse to None
+OPEN_ENDED = {"present", "current", "currently", "now", "ongoing", "today",
+              "to date", "till date", "to present"}
+EMPTY = {"", "not available", "n/a", "na", "none", "null", "unknown", "-",
+         "—", "?"}
+
+_MONTH = r"(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?"
+_DAY = r"(\d{1,2})(?:st|nd|rd|th)?"
+
+
+def _numeric(match: Match) -> Tuple[int, int, int]:
+    first, second, year = (int(group) for group in match.groups())
+    # Month first, unless that cannot be a month
+    return (year, second, first) if first > 12 else (year, first, second)
+
+
+# (format name, compiled pattern, (year, month, day) from the match), tried
+# in order against the stripped, lower-cased value
+PATTERNS: List[Tuple[str, re.Pattern, Callable[[Match], Tuple[int, int,
+                                                              int]]]] = [
+    ("iso", re.compile(r"^(\d{4})-(\d{1,2})-(\d{1,2})(?:[t ].*)?$"),
+     lambda m: (int(m[1]), int(m[2]), int(m[3]))),
+    ("year_month", re.compile(r"^(\d{4})[-/.](\d{1,2})$"),
+     lambda m: (int(m[1]), int(m[2]), 1)),
+    ("month_year", re.compile(r"^(\d{1,2})[-/.](\d{4})$"),
+     lambda m: (int(m[2]), int(m[1]), 1)),
+    ("numeric", re.compile(r"^(\d{1,2})[-/.](\d{1,2})[-/.](\d{4})$"),
+     _numeric),
+    ("month_name_year", re.compile(rf"^{_MONTH},?\s+(\d{{4}})$"),
+     lambda m: (int(m[2]), MONTHS[m[1]], 1)),
+    ("month_name_day_year",
+     re.compile(rf"^{_MONTH}\s+{_DAY},?\s+(\d{{4}})$"),
+     lambda m: (int(m[3]), MONTHS[m[1]], int(m[2]))),
+    ("day_month_name_year",
+     re.compile(rf"^{_DAY}\s+{_MONTH},?\s+(\d{{4}})$"),
+     lambda m: (int(m[3]), MONTHS[m[2]], int(m[1]))),
+    ("season_year",
+     re.compile(r"^(spring|summer|fall|autumn|winter)\s+(\d{4})$"),
+     lambda m: (int(m[2]), SEASONS[m[1]], 1)),
+    ("quarter_year", re.compile(r"^q([1-4])\s+(\d{4})$"),
+     lambda m: (int(m[2]), 3 * int(m[1]) - 2, 1)),
+    ("year", re.compile(r"^(\d{4})$"), lambda m: (int(m[1]), 1, 1)),
+]
+
+# Set while a model is validated, to count date values that a plain `date`
+# field would have rejected
+_lenient_parses: ContextVar[Optional[List[int]]] = ContextVar(
+    "lenient_date_parses", default=None)
+
+_STRICT_DATE = TypeAdapter(Optional[date])
+
+
+@lru_cache(maxsize=4096)
+def parse_date_string(value: str) -> Tuple[Optional[date], str]:
+    """
+    Parses a human-written date ("Jan 2020", "2019-05", "Present", ...)
+    and names the format that matched. Results are memoized, since the
+    same few strings recur across a profile and across requests.
+    """
+    text = " ".join(value.split()).lower()
+    if text in EMPTY:
+        return None, "empty"
+    if text in OPEN_ENDED:
+        return None, "open_ended"
+    for name, pattern, parts in PATTERNS:
+        match = pattern.match(text)
+        if match:
+            try:
+                return date(*parts(match)), name
+            except (KeyError, ValueError):
+                break
+    return None, "unparsed"
+
+
+def flexible_date_parser(value: Any) -> Optional[date]:
     if isinstance(value, date):
         return value
-    if isinstance(value, str):
-        if value.lower() in ["not available", "n/a", ""]:
-            return None
-        try:
-            return date.fromisoformat(value)
-        except ValueError:
-            # Try parsing just the year
-            try:
-                return date(int(value), 1, 1)
-            except ValueError:
-                return None
-    return None
+    if not isinstance(value, str):
+        return None
+    parsed, date_format = parse_date_string(value)
+    DATE_PARSES.inc(format=date_format)
+    return parsed
+
+
+@lru_cache(maxsize=4096)
+def strict_date_rejects(value: str) -> bool:
+    try:
+        _STRICT_DATE.validate_python(value)
+    except ValidationError:
+        return True
+    return False
+
+
+def recovering_date_parser(value: Any) -> Optional[date]:
+    """
+    flexible_date_parser for fields that used to be plain dates, where a
+    value like "Jan 2020" failed validation and made the LLM try again.
+    Such values are recorded for count_lenient_dates.
+    """
+    lenient = _lenient_parses.get()
+    if (lenient is not None and isinstance(value, str)
+            and strict_date_rejects(value)):
+        lenient.append(1)
+    return flexible_date_parser(value)
+
+
+@contextmanager
+def count_lenient_dates() -> Iterator[List[int]]:
+    """
+    Collects one entry per date value in the block that strict date
+    validation would have rejected.
+    """
+    lenient: List[int] = []
+    token = _lenient_parses.set(lenient)
+    try:
+        yield lenient
+    finally:
+        _lenient_parses.reset(token)
+
+
+# A date field that accepts common human date formats, with "Present" and
+# unknown values becoming None
+FlexibleDate = Annotated[Optional[date], BeforeValidator(flexible_date_parser)]
+# The same, for fields that used to be plain dates; values they would have
+# rejected count towards grosbeak_date_retries_avoided_total
+RecoveringDate = Annotated[Optional[date],
+                           BeforeValidator(recovering_date_parser)]
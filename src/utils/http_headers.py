@@ -0,0 +1,13 @@
+from typing import Mapping, Optional
+
+
+def header_int(headers: Mapping[str, str], name: str) -> Optional[int]:
+    """
+    Reads an integer header such as X-RateLimit-Remaining or Retry-After,
+    or None if it is missing or not a number.
+    """
+    value = headers.get(name)
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
@@ -0,0 +1,315 @@
+import html
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, Type
+from pydantic import BaseModel, create_model
+from src.models.job import JobInformation
+
+JSONLD = "jsonld"
+TEXT = "text"
+METADATA = "metadata"
+LLM = "llm"
+MISSING = "missing"
+
+# Fields the LLM is asked for when the rules cannot fill them. Optional
+# fields that are still empty are only requested alongside these
+ESSENTIAL_FIELDS = [
+    name for name, field in JobInformation.model_fields.items()
+    if field.is_required()
+] + ["requirements"]
+
+EMPLOYMENT_TYPES = {
+    "FULL_TIME": "Full-time",
+    "PART_TIME": "Part-time",
+    "CONTRACTOR": "Contract",
+    "TEMPORARY": "Temporary",
+    "INTERN": "Internship",
+    "VOLUNTEER": "Volunteer",
+    "PER_DIEM": "Per diem",
+    "OTHER": "Other",
+}
+
+# Section headings mapped to list fields, most specific first
+SECTION_HEADINGS = [
+    ("qualifications", ("preferred qualifications", "nice to have",
+                        "bonus points", "preferred", "qualifications")),
+    ("requirements", ("minimum qualifications", "basic qualifications",
+                      "required qualifications", "requirements",
+                      "what you'll need", "what you need",
+                      "what we're looking for", "what we are looking for",
+                      "must have", "you have", "about you")),
+    ("benefits", ("perks and benefits", "benefits", "perks",
+                  "what we offer")),
+]
+
+# LinkedIn-style job criteria, either "Label: value." or the label and
+# value on consecutive lines
+CRITERIA = {
+    "seniority level": "seniority",
+    "employment type": "employment_type",
+    "job function": "job_function",
+    "industries": "industries",
+}
+_CRITERIA = re.compile(
+    r"\b(seniority level|employment type|job function|industries)"
+    r"[ \t]*(?::[ \t]*|\n[ \t]*)([^\n]+?)(?:\.(?=\s)|\.?$|\n)",
+    re.IGNORECASE | re.MULTILINE)
+_HEADING = re.compile(r"^([A-Za-z'’ ]{2,40}):?\s*(.*)$")
+_BULLET = re.compile(r"^\s*(?:[-*•·–]|\d+[.)])\s+")
+_TAG = re.compile(r"<[^>]+>")
+_BLOCK_END = re.compile(r"<\s*(?:/p|/div|/h\d|/ul|/ol)\s*>", re.IGNORECASE)
+_LINE_BREAK = re.compile(r"<\s*br\s*/?\s*>", re.IGNORECASE)
+_LIST_ITEM = re.compile(r"<\s*li[^>]*>", re.IGNORECASE)
+_BLANK_LINES = re.compile(r"\n\s*\n+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+BRIEF_DESCRIPTION_CHARS = 300
+
+
+def html_to_text(value: str) -> str:
+    text = _LIST_ITEM.sub("\n- ", value)
+    text = _LINE_BREAK.sub("\n", text)
+    text = _BLOCK_END.sub("\n\n", text)
+    text = html.unescape(_TAG.sub("", text))
+    lines = [line.strip() for line in text.splitlines()]
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+
+def text_items(value: Any) -> List[str]:
+    """
+    Splits a JSON-LD string (possibly an HTML list) or list of strings
+    into one item per line.
+    """
+    if isinstance(value, list):
+        return [item for entry in value for item in text_items(entry)]
+    if isinstance(value, dict):
+        value = value.get("name") or value.get("credentialCategory") or ""
+    if not isinstance(value, str):
+        return []
+    return [
+        _BULLET.sub("", line).strip()
+        for line in html_to_text(value).splitlines() if line.strip()
+    ]
+
+
+def first_text(value: Any) -> Optional[str]:
+    if isinstance(value, list):
+        value = ", ".join(filter(None, (first_text(item) for item in value)))
+    if isinstance(value, dict):
+        value = value.get("name")
+    if isinstance(value, str) and value.strip():
+        return html.unescape(value.strip())
+    return None
+
+
+def find_job_posting(value: Any) -> Optional[Dict[str, Any]]:
+    """
+    Finds the first schema.org JobPosting in scraped JSON-LD, which may be
+    a single object, a list, or nested under "@graph".
+    """
+    if isinstance(value, list):
+        for item in value:
+            found = find_job_posting(item)
+            if found is not None:
+                return found
+    elif isinstance(value, dict):
+        types = value.get("@type")
+        if "JobPosting" in (types if isinstance(types, list) else [types]):
+            return value
+        return find_job_posting(value.get("@graph"))
+    return None
+
+
+def posting_location(posting: Dict[str, Any]) -> Optional[str]:
+    places = []
+    locations = posting.get("jobLocation") or []
+    for location in (locations if isinstance(locations, list) else
+                     [locations]):
+        address = (location.get("address")
+                   if isinstance(location, dict) else location)
+        if isinstance(address, dict):
+            parts = [
+                first_text(address.get(key))
+                for key in ("addressLocality", "addressRegion",
+                            "addressCountry")
+            ]
+            address = ", ".join(part for part in parts if part)
+        if isinstance(address, str) and address and address not in places:
+            places.append(address)
+    if posting.get("jobLocationType") == "TELECOMMUTE":
+        regions = first_text(posting.get("applicantLocationRequirements"))
+        return f"Remote ({regions})" if regions else "Remote"
+    return "; ".join(places) or None
+
+
+@lru_cache(maxsize=None)
+def job_fields_model(fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """
+    A JobInformation with only the given fields, used to ask the LLM for
+    just the fields the rules could not fill.
+    """
+    return create_model(
+        "JobInformation",
+        __doc__="The requested fields of a job posting",
+        **{
+            name: (JobInformation.model_fields[name].annotation,
+                   JobInformation.model_fields[name])
+            for name in fields
+        })
+
+
+class JobExtraction:
+    """
+    JobInformation fields filled so far and where each one came from.
+    A field is only set once, so earlier sources take precedence.
+    """
+
+    def __init__(self):
+        self.values: Dict[str, Any] = {}
+        self.provenance: Dict[str, str] = {}
+
+    def set(self, field: str, value: Any, source: str) -> None:
+        if field in self.values or value in (None, "", []):
+            return
+        self.values[field] = value
+        self.provenance[field] = source
+
+    def missing(self) -> List[str]:
+        return [
+            field for field in JobInformation.model_fields
+            if field not in self.values
+        ]
+
+    def needs_llm(self) -> bool:
+        return any(field not in self.values for field in ESSENTIAL_FIELDS)
+
+    def merge(self, values: Dict[str, Any], source: str) -> None:
+        for field, value in values.items():
+            self.set(field, value, source)
+
+    def build(self) -> JobInformation:
+        return JobInformation(**self.values)
+
+    def field_sources(self) -> Dict[str, str]:
+        return {
+            field: self.provenance.get(field, MISSING)
+            for field in JobInformation.model_fields
+        }
+
+
+def extract_from_jsonld(extraction: JobExtraction,
+                        posting: Dict[str, Any]) -> Optional[str]:
+    extraction.set("title", first_text(posting.get("title")), JSONLD)
+    extraction.set("company", first_text(posting.get("hiringOrganization")),
+                   JSONLD)
+    extraction.set("location", posting_location(posting), JSONLD)
+    employment_types = posting.get("employmentType") or []
+    if isinstance(employment_types, str):
+        employment_types = [employment_types]
+    extraction.set(
+        "employment_type", ", ".join(
+            EMPLOYMENT_TYPES.get(str(kind).upper(), str(kind))
+            for kind in employment_types), JSONLD)
+    extraction.set("industries", first_text(posting.get("industry")), JSONLD)
+    extraction.set("job_function",
+                   first_text(posting.get("occupationalCategory")), JSONLD)
+    extraction.set(
+        "requirements",
+        text_items(posting.get("experienceRequirements")) +
+        text_items(posting.get("skills")), JSONLD)
+    extraction.set(
+        "qualifications",
+        text_items(posting.get("qualifications")) +
+        text_items(posting.get("educationRequirements")), JSONLD)
+    extraction.set("benefits", text_items(posting.get("jobBenefits")),
+                   JSONLD)
+    description = posting.get("description")
+    return html_to_text(description) if isinstance(description, str) else None
+
+
+def extract_sections(extraction: JobExtraction, text: str,
+                     source: str) -> None:
+    """
+    Fills list fields from headed sections ("Requirements:" followed by
+    bullets, or an inline comma-separated list) and the LinkedIn-style
+    criteria from "Label: value" lines.
+    """
+    sections: Dict[str, List[str]] = {}
+    current: Optional[List[str]] = None
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if _BULLET.match(stripped):
+            if current is not None:
+                current.append(_BULLET.sub("", stripped).strip())
+            continue
+        current = None
+        match = _HEADING.match(stripped)
+        if not match:
+            continue
+        heading = match.group(1).strip().lower().replace("’", "'")
+        for field, headings in SECTION_HEADINGS:
+            if heading in headings and field not in sections:
+                current = sections[field] = []
+                inline = match.group(2).strip().rstrip(".")
+                if inline:
+                    current.extend(item.strip()
+                                   for item in re.split(r"[;,]", inline)
+                                   if item.strip())
+                    current = None
+                break
+    for field, items in sections.items():
+        extraction.set(field, items, source)
+    for label, value in _CRITERIA.findall(text):
+        extraction.set(CRITERIA[label.lower()], value.strip(), source)
+
+
+def brief_description(text: str) -> Optional[str]:
+    """
+    The opening sentences of the first paragraph that reads like prose,
+    cut at a sentence boundary near BRIEF_DESCRIPTION_CHARS.
+    """
+    for paragraph in text.split("\n\n"):
+        paragraph = " ".join(paragraph.split())
+        if len(paragraph) < 80 or _BULLET.match(paragraph):
+            continue
+        brief = ""
+        for sentence in _SENTENCE_END.split(paragraph):
+            if brief and len(brief) + len(sentence) > BRIEF_DESCRIPTION_CHARS:
+                break
+            brief = f"{brief} {sentence}".strip()
+        return brief
+    return None
+
+
+def extract_job_posting(data: Dict[str, Any]) -> JobExtraction:
+    """
+    Fills as much of JobInformation as possible from a Serper scrape
+    without an LLM: schema.org JobPosting JSON-LD first, then headed
+    sections and job criteria in the page text, then page metadata.
+    """
+    extraction = JobExtraction()
+    posting = find_job_posting(data.get("jsonld"))
+    posting_text = (extract_from_jsonld(extraction, posting)
+                    if posting is not None else None)
+    page_text = data.get("text") if isinstance(data.get("text"),
+                                               str) else None
+
+    if posting_text:
+        extract_sections(extraction, posting_text, JSONLD)
+        extraction.set("full_description", posting_text, JSONLD)
+        extraction.set("description", brief_description(posting_text),
+                       JSONLD)
+    if page_text:
+        extract_sections(extraction, page_text, TEXT)
+        extraction.set("full_description", page_text.strip(), TEXT)
+
+    metadata = data.get("metadata") or {}
+    extraction.set(
+        "description",
+        first_text(metadata.get("description") or
+                   metadata.get("og:description")), METADATA)
+    if page_text:
+        extraction.set("description", brief_description(page_text), TEXT)
+    return extraction
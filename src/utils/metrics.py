@@ -0,0 +1,280 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0,
+                   60.0, 90.0, 120.0, 180.0)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str,
+                 labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _label_text(self,
+                    key: Tuple[str, ...],
+                    extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, key))
+        if extra is not None:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"'
+                              for name, value in pairs) + "}"
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str,
+                 labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [
+                f"{self.name}{self._label_text(key)} {_format_value(value)}"
+                for key, value in sorted(self._values.items())
+            ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self,
+                 name: str,
+                 documentation: str,
+                 labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.setdefault(key,
+                                             [0] * (len(self.buckets) + 1))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, counts in sorted(self._counts.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"), ),
+                                        counts):
+                    cumulative += count
+                    labels = self._label_text(key, ("le", _format_value(bound)))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                lines.append(f"{self.name}_sum{self._label_text(key)} "
+                             f"{_format_value(self._sums[key])}")
+                lines.append(
+                    f"{self.name}_count{self._label_text(key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self,
+                name: str,
+                documentation: str,
+                labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self,
+              name: str,
+              documentation: str,
+              labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self,
+                  name: str,
+                  documentation: str,
+                  labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(
+            Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """
+        Renders every metric in the Prometheus text exposition format.
+        """
+        return "\n".join(metric.render()
+                         for metric in self.metrics.values()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+REQUESTS_IN_FLIGHT = REGISTRY.gauge("grosbeak_requests_in_flight",
+                                    "HTTP requests currently being served",
+                                    ["path"])
+PIPELINE_STAGE_SECONDS = REGISTRY.histogram(
+    "grosbeak_pipeline_stage_duration_seconds",
+    "Duration of each resume pipeline stage", ["stage"])
+PIPELINE_ERRORS = REGISTRY.counter("grosbeak_pipeline_errors_total",
+                                   "Failures by pipeline stage", ["stage"])
+SCRAPE_SECONDS = REGISTRY.histogram("grosbeak_scrape_duration_seconds",
+                                    "Latency of scraping a page via Serper",
+                                    ["source"])
+LLM_CALL_SECONDS = REGISTRY.histogram(
+    "grosbeak_llm_call_duration_seconds",
+    "Latency of LLM calls that reached the provider", ["stage", "model"])
+LLM_TOKENS = REGISTRY.counter("grosbeak_llm_tokens_total",
+                              "Tokens reported by the provider",
+                              ["stage", "model", "kind"])
+LLM_EVENTS = REGISTRY.counter(
+    "grosbeak_llm_events_total",
+    "LLM gateway events: calls, hedges, deadlines and fallbacks",
+    ["event"])
+LLM_SCHEDULER_EVENTS = REGISTRY.counter(
+    "grosbeak_llm_scheduler_events_total",
+    "LLM scheduler dispatches, rate limits and retries", ["event"])
+LLM_SCHEDULER_QUEUE = REGISTRY.gauge(
+    "grosbeak_llm_scheduler_queue",
+    "LLM calls waiting for or holding a scheduler slot", ["state"])
+CACHE_REQUESTS = REGISTRY.counter("grosbeak_cache_requests_total",
+                                  "Cache lookups by cache and result",
+                                  ["cache", "result"])
+PROMPT_CONTEXT_DROPPED = REGISTRY.counter(
+    "grosbeak_prompt_context_dropped_items_total",
+    "Candidate items left out to fit an agent's context budget", ["section"])
+HTTP_CLIENT_IN_FLIGHT = REGISTRY.gauge(
+    "grosbeak_http_client_requests_in_flight",
+    "Outbound requests in flight on the shared HTTP client", ["host"])
+HTTP_CLIENT_EVENTS = REGISTRY.counter(
+    "grosbeak_http_client_events_total",
+    "Shared HTTP client pool events: connections created, reused or "
+    "queued, and DNS cache hits and misses", ["host", "event"])
+SCRAPE_CACHE_EVENTS = REGISTRY.counter(
+    "grosbeak_scrape_cache_events_total",
+    "Scrape cache lookups (fresh, stale, miss, bypass) and background "
+    "revalidations by source", ["source", "event"])
+JOB_EXTRACTIONS = REGISTRY.counter(
+    "grosbeak_job_extractions_total",
+    "Job postings parsed, by path: rules only, rules plus an LLM call for "
+    "the missing fields, LLM only, or a cached parse", ["path"])
+JOB_EXTRACTION_FIELDS = REGISTRY.counter(
+    "grosbeak_job_extraction_fields_total",
+    "Where each JobInformation field came from: jsonld, text, metadata, "
+    "llm or missing", ["field", "source"])
+SINGLE_FLIGHT_EVENTS = REGISTRY.counter(
+    "grosbeak_single_flight_events_total",
+    "Coalesced fetches: calls that started the work (leader), joined an "
+    "in-flight call, or were abandoned by every caller", ["name", "event"])
+GITHUB_FETCH_SECONDS = REGISTRY.histogram(
+    "grosbeak_github_fetch_duration_seconds",
+    "Wall time to fetch one GitHub profile")
+GITHUB_FETCH_REQUESTS = REGISTRY.histogram(
+    "grosbeak_github_fetch_requests",
+    "GitHub API requests made to fetch one GitHub profile",
+    buckets=(1, 2, 3, 4, 6, 8, 12, 16, 24, 32, 64, 128))
+GITHUB_REQUESTS = REGISTRY.counter(
+    "grosbeak_github_requests_total",
+    "GitHub API requests by rate-limit resource and result (ok, "
+    "not_modified, rate_limited, error)", ["resource", "result"])
+GITHUB_RATE_LIMIT = REGISTRY.gauge(
+    "grosbeak_github_rate_limit",
+    "GitHub quota as last reported: limit, remaining and reset_timestamp "
+    "per rate-limit resource", ["resource", "kind"])
+GITHUB_RATE_LIMIT_EVENTS = REGISTRY.counter(
+    "grosbeak_github_rate_limit_events_total",
+    "GitHub requests delayed by pacing, rate-limit responses, and requests "
+    "skipped because the quota would not reset in time",
+    ["resource", "event"])
+GITHUB_RATE_LIMIT_WAIT_SECONDS = REGISTRY.counter(
+    "grosbeak_github_rate_limit_wait_seconds_total",
+    "Time GitHub requests spent waiting on the rate limiter", ["resource"])
+SEARCH_QUERIES = REGISTRY.counter(
+    "grosbeak_search_queries_total",
+    "Web search queries answered from the cache, fetched from Serper, or "
+    "failed", ["result"])
+DATE_PARSES = REGISTRY.counter(
+    "grosbeak_date_parses_total",
+    "Date strings in parsed models by the format they matched", ["format"])
+DATE_RETRIES_AVOIDED = REGISTRY.counter(
+    "grosbeak_date_retries_avoided_total",
+    "Parsed models with a date in a formerly strict date field that "
+    "strict validation would have rejected, each of which would have cost "
+    "an LLM re-ask", ["model"])
+RESUME_SECTION_SECONDS = REGISTRY.histogram(
+    "grosbeak_resume_section_duration_seconds",
+    "Latency of the outline and each section call when an agent writes "
+    "its resume section by section", ["stage", "section"])
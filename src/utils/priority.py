@@ -0,0 +1,37 @@
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Optional
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    BATCH = 1
+
+
+# Priority for LLM calls made from the current task. Batch work sets this to
+# Priority.BATCH so interactive requests are dispatched ahead of it.
+llm_priority: ContextVar[Priority] = ContextVar("llm_priority",
+                                                default=Priority.INTERACTIVE)
+
+
+class SharedPriority:
+    """
+    Priority of work shared by several callers (see SingleFlight). It
+    rises to the highest priority among them as callers join.
+    """
+
+    def __init__(self, priority: Priority):
+        self.priority = priority
+
+    def raise_to(self, priority: Priority) -> None:
+        self.priority = min(self.priority, priority)
+
+
+# Set inside shared work, where it takes precedence over llm_priority
+shared_priority: ContextVar[Optional[SharedPriority]] = ContextVar(
+    "shared_priority", default=None)
+
+
+def current_priority() -> Priority:
+    shared = shared_priority.get()
+    return shared.priority if shared is not None else llm_priority.get()
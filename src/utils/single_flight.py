@@ -0,0 +1,73 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+from src.utils.metrics import SINGLE_FLIGHT_EVENTS
+from src.utils.priority import (SharedPriority, current_priority,
+                                 shared_priority)
+
+
+class _Flight:
+
+    def __init__(self, task: "asyncio.Task[Any]", priority: SharedPriority):
+        self.task = task
+        self.priority = priority
+        self.waiters = 0
+
+
+async def _run_shared(operation: Callable[[], Awaitable[Any]],
+                      priority: SharedPriority) -> Any:
+    shared_priority.set(priority)
+    return await operation()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key into one in-flight
+    operation whose result (or exception) every caller shares.
+
+    The operation runs in its own task and callers await it through
+    asyncio.shield, so a caller being cancelled (a client disconnecting)
+    does not cancel the work for the others. The operation is only
+    cancelled once every caller waiting on it has gone away.
+
+    The operation's LLM calls run at the highest priority among the
+    callers waiting on it, so an interactive request that joins work a
+    batch request started is not queued behind other batch work. Calls
+    already waiting in the scheduler keep the priority they queued with.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[Hashable, _Flight] = {}
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    async def run(self, key: Hashable,
+                  operation: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._flights.get(key)
+        priority = current_priority()
+        if flight is None:
+            shared = SharedPriority(priority)
+            flight = _Flight(
+                asyncio.ensure_future(_run_shared(operation, shared)), shared)
+            self._flights[key] = flight
+            flight.task.add_done_callback(
+                lambda _, flight=flight: self._forget(key, flight))
+            SINGLE_FLIGHT_EVENTS.inc(name=self.name, event="leader")
+        else:
+            flight.priority.raise_to(priority)
+            SINGLE_FLIGHT_EVENTS.inc(name=self.name, event="joined")
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                self._forget(key, flight)
+                flight.task.cancel()
+                SINGLE_FLIGHT_EVENTS.inc(name=self.name, event="abandoned")
+
+    def in_flight(self) -> int:
+        return len(self._flights)
@@ -0,0 +1,176 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+
+class StageTiming:
+
+    def __init__(self, name: str, started_at: float, finished_at: float):
+        self.name = name
+        self.started_at = started_at
+        self.finished_at = finished_at
+
+    @property
+    def duration(self) -> float:
+        return self.finished_at - self.started_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "stage": self.name,
+            "started_at": round(self.started_at, 4),
+            "finished_at": round(self.finished_at, 4),
+            "duration": round(self.duration, 4),
+        }
+
+
+class Stage:
+
+    def __init__(self,
+                 name: str,
+                 func: Callable[..., Awaitable[Any]],
+                 inputs: Iterable[str] = (),
+                 optional_inputs: Iterable[str] = (),
+                 optional_timeout: float = 0.0):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.optional_inputs = list(optional_inputs)
+        self.optional_timeout = optional_timeout
+
+
+class StageGraph:
+    """
+    Runs async stages as soon as their declared inputs resolve.
+
+    Each stage receives its inputs as keyword arguments. Optional inputs do
+    not hold a stage back: once the required inputs are ready, the stage
+    waits at most optional_timeout seconds for them and receives None for
+    any that are still pending or failed.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, Stage] = {}
+        self.values: Dict[str, Any] = {}
+        self.timings: Dict[str, StageTiming] = {}
+        self.errors: Dict[str, Exception] = {}
+        self._started = 0.0
+
+    def add_value(self, name: str, value: Any) -> None:
+        self.values[name] = value
+
+    def add_stage(self,
+                  name: str,
+                  func: Callable[..., Awaitable[Any]],
+                  inputs: Iterable[str] = (),
+                  optional_inputs: Iterable[str] = (),
+                  optional_timeout: float = 0.0) -> None:
+        if name in self.stages or name in self.values:
+            raise ValueError(f"Stage {name} is already defined")
+        self.stages[name] = Stage(name, func, inputs, optional_inputs,
+                                  optional_timeout)
+
+    def _required_stages(self, targets: Iterable[str]) -> List[str]:
+        needed: List[str] = []
+        pending = list(targets)
+        while pending:
+            name = pending.pop()
+            if name in needed or name in self.values:
+                continue
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage: {name}")
+            needed.append(name)
+            stage = self.stages[name]
+            pending.extend(stage.inputs + stage.optional_inputs)
+        return needed
+
+    async def _run_stage(self, stage: Stage,
+                         tasks: Dict[str, "asyncio.Task[Any]"]) -> Any:
+        kwargs = {}
+        for name in stage.inputs:
+            kwargs[name] = (self.values[name]
+                            if name in self.values else await tasks[name])
+
+        optional = {
+            name: tasks[name]
+            for name in stage.optional_inputs if name not in self.values
+        }
+        if optional:
+            await asyncio.wait(optional.values(),
+                               timeout=stage.optional_timeout)
+        for name in stage.optional_inputs:
+            if name in self.values:
+                kwargs[name] = self.values[name]
+                continue
+            task = optional[name]
+            if task.done() and not task.cancelled() and task.exception(
+            ) is None:
+                kwargs[name] = task.result()
+            else:
+                kwargs[name] = None
+
+        started_at = time.perf_counter() - self._started
+        try:
+            return await stage.func(**kwargs)
+        except Exception as e:
+            self.errors[stage.name] = e
+            raise
+        finally:
+            self.timings[stage.name] = StageTiming(
+                stage.name, started_at,
+                time.perf_counter() - self._started)
+
+    async def run(self, targets: Iterable[str]) -> Dict[str, Any]:
+        """
+        Runs every stage the targets depend on and returns all resolved
+        values. Stages that are still running once the targets are done
+        (for example a slow optional input) are cancelled.
+        """
+        targets = list(targets)
+        self._started = time.perf_counter()
+        tasks: Dict[str, "asyncio.Task[Any]"] = {}
+        for name in reversed(self._required_stages(targets)):
+            tasks[name] = asyncio.ensure_future(
+                self._run_stage(self.stages[name], tasks))
+
+        try:
+            for name in targets:
+                if name in tasks:
+                    await tasks[name]
+        finally:
+            for task in tasks.values():
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+        results = dict(self.values)
+        for name, task in tasks.items():
+            if not task.cancelled() and task.exception() is None:
+                results[name] = task.result()
+        return results
+
+    def critical_path(self, target: str) -> List[str]:
+        """
+        Walks back from the target through whichever input finished last
+        before each stage started.
+        """
+        path = []
+        name: Optional[str] = target
+        while name is not None and name in self.timings:
+            path.append(name)
+            stage = self.stages[name]
+            finished_inputs = [
+                self.timings[dependency]
+                for dependency in stage.inputs + stage.optional_inputs
+                if dependency in self.timings and self.timings[dependency].
+                finished_at <= self.timings[name].started_at
+            ]
+            name = max(finished_inputs,
+                       key=lambda timing: timing.finished_at
+                       ).name if finished_inputs else None
+        return list(reversed(path))
+
+    def timing_report(self) -> List[Dict[str, Any]]:
+        return [
+            timing.to_dict() for timing in sorted(
+                self.timings.values(), key=lambda timing: timing.started_at)
+        ]
@@ -0,0 +1,263 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from src.utils.metrics import CACHE_REQUESTS
+
+
+class CacheEntry:
+
+    def __init__(self, value: str, created_at: float,
+                 expires_at: Optional[float]):
+        self.value = value
+        self.created_at = created_at
+        self.expires_at = expires_at
+
+    @property
+    def size(self) -> int:
+        return len(self.value.encode("utf-8"))
+
+    def is_expired(self, now: Optional[float] = None) -> bool:
+        if self.expires_at is None:
+            return False
+        return (now or time.time()) >= self.expires_at
+
+
+class SQLiteCacheBackend:
+    """
+    Persistent key/value tier backed by a single SQLite table.
+    """
+
+    def __init__(self, path: str, table: str = "cache"):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL,
+                accessed_at REAL NOT NULL
+            )
+            """)
+        self._conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {self.table}_accessed_at "
+            f"ON {self.table} (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, created_at, expires_at FROM {self.table} "
+                "WHERE key = ?", (key, )).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?",
+                (time.time(), key))
+            self._conn.commit()
+        return CacheEntry(row[0], row[1], row[2])
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} "
+                "(key, value, size, created_at, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, entry.value, entry.size, entry.created_at,
+                 entry.expires_at, time.time()))
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?",
+                               (key, ))
+            self._conn.commit()
+
+    def evict(self,
+              max_entries: Optional[int] = None,
+              max_bytes: Optional[int] = None,
+              evict_expired: bool = True) -> int:
+        """
+        Removes expired rows, then least recently accessed rows until the
+        table fits within the given limits. Returns the number of rows removed.
+        """
+        removed = 0
+        with self._lock:
+            if evict_expired:
+                removed += self._conn.execute(
+                    f"DELETE FROM {self.table} "
+                    "WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                    (time.time(), )).rowcount
+            if max_entries is not None:
+                removed += self._conn.execute(
+                    f"DELETE FROM {self.table} WHERE key IN ("
+                    f"SELECT key FROM {self.table} ORDER BY accessed_at DESC "
+                    "LIMIT -1 OFFSET ?)", (max_entries, )).rowcount
+            if max_bytes is not None:
+                total = self._conn.execute(
+                    f"SELECT COALESCE(SUM(size), 0) FROM {self.table}"
+                ).fetchone()[0]
+                if total > max_bytes:
+                    rows = self._conn.execute(
+                        f"SELECT key, size FROM {self.table} "
+                        "ORDER BY accessed_at ASC").fetchall()
+                    for key, size in rows:
+                        if total <= max_bytes:
+                            break
+                        self._conn.execute(
+                            f"DELETE FROM {self.table} WHERE key = ?",
+                            (key, ))
+                        total -= size
+                        removed += 1
+            self._conn.commit()
+        return removed
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class TieredCache:
+    """
+    Two-tier string cache: an in-memory LRU in front of an optional
+    persistent backend, with TTL and entry/byte-size eviction.
+    """
+
+    def __init__(self,
+                 name: str,
+                 max_entries: int = 1024,
+                 ttl_seconds: Optional[float] = None,
+                 max_bytes: Optional[int] = None,
+                 backend: Optional[SQLiteCacheBackend] = None,
+                 backend_max_entries: Optional[int] = None,
+                 evict_every: int = 100):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.backend = backend
+        self.backend_max_entries = backend_max_entries
+        self.evict_every = evict_every
+        self._memory: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._memory_bytes = 0
+        self._writes_since_eviction = 0
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        self.backend_hits = 0
+
+    def _remember(self, key: str, entry: CacheEntry) -> None:
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= previous.size
+        self._memory[key] = entry
+        self._memory_bytes += entry.size
+        while self._memory and (
+                len(self._memory) > self.max_entries or
+            (self.max_bytes is not None and self._memory_bytes > self.max_bytes)):
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.size
+
+    def _forget(self, key: str) -> None:
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= entry.size
+
+    async def get_entry(self,
+                        key: str,
+                        include_expired: bool = False) -> Optional[CacheEntry]:
+        """
+        Looks the key up in memory, then in the persistent tier. Expired
+        entries are only returned when include_expired is set.
+        """
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            if include_expired or not entry.is_expired(now):
+                self._memory.move_to_end(key)
+                self.hits += 1
+                self.memory_hits += 1
+                CACHE_REQUESTS.inc(cache=self.name, result="hit")
+                return entry
+            self._forget(key)
+
+        if self.backend is not None:
+            entry = await asyncio.to_thread(self.backend.get, key)
+            if entry is not None and (include_expired
+                                      or not entry.is_expired(now)):
+                self._remember(key, entry)
+                self.hits += 1
+                self.backend_hits += 1
+                CACHE_REQUESTS.inc(cache=self.name, result="hit")
+                return entry
+
+        self.misses += 1
+        CACHE_REQUESTS.inc(cache=self.name, result="miss")
+        return None
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = await self.get_entry(key)
+        return entry.value if entry is not None else None
+
+    async def set(self,
+                  key: str,
+                  value: str,
+                  ttl_seconds: Optional[float] = None) -> None:
+        now = time.time()
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        entry = CacheEntry(value, now, now + ttl if ttl is not None else None)
+        self._remember(key, entry)
+        if self.backend is not None:
+            await asyncio.to_thread(self.backend.set, key, entry)
+            self._writes_since_eviction += 1
+            if self._writes_since_eviction >= self.evict_every:
+                self._writes_since_eviction = 0
+                await asyncio.to_thread(self.backend.evict,
+                                        self.backend_max_entries,
+                                        self.max_bytes)
+
+    async def delete(self, key: str) -> None:
+        self._forget(key)
+        if self.backend is not None:
+            await asyncio.to_thread(self.backend.delete, key)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "memory_hits": self.memory_hits,
+            "backend_hits": self.backend_hits,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+        }
+
+
+def open_tiered_cache(name: str,
+                      path: Optional[str],
+                      max_entries: int,
+                      ttl_seconds: Optional[float] = None,
+                      max_bytes: Optional[int] = None,
+                      backend_max_entries: Optional[int] = None,
+                      evict_every: int = 100) -> TieredCache:
+    """
+    Builds a TieredCache, adding a SQLite tier (one table per cache name)
+    when a path is configured.
+    """
+    backend = SQLiteCacheBackend(path, table=name) if path else None
+    return TieredCache(name,
+                       max_entries=max_entries,
+                       ttl_seconds=ttl_seconds,
+                       max_bytes=max_bytes,
+                       backend=backend,
+                       backend_max_entries=backend_max_entries,
+                       evict_every=evict_every)
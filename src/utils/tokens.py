@@ -0,0 +1,18 @@
+from typing import Dict, List
+
+# Rough average for English text with OpenAI tokenizers; good enough for
+# budgeting and rate limiting without pulling in a tokenizer dependency.
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def estimate_messages_tokens(messages: List[Dict[str, str]]) -> int:
+    return sum(
+        estimate_tokens(message.get("content") or "") +
+        MESSAGE_OVERHEAD_TOKENS for message in messages)
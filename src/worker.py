@@ -0,0 +1,162 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import tempfile
+import aiofiles
+import logfire
+from src.config import (get_http_client, get_job_queue, get_orchestrator,
+                        get_result_store, get_settings)
+from src.orchestrator import InvalidRequestError
+from src.services.job_queue import JobQueue, QueuedJob
+
+
+class ResumeWorker:
+    """
+    Claims queued resume requests and runs them through the Orchestrator,
+    at most `concurrency` at a time, writing results back to the queue.
+    """
+
+    def __init__(self,
+                 queue: JobQueue,
+                 concurrency: int,
+                 poll_interval: float = 1.0):
+        self.queue = queue
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        self.orchestrator = get_orchestrator()
+        self.result_store = get_result_store()
+
+    async def keep_lease(self, job: QueuedJob, work: asyncio.Task) -> None:
+        """
+        Renews the job's lease while `work` runs. If the lease was lost to
+        another worker, `work` is cancelled so only one worker finishes it.
+        """
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            if not await self.queue.heartbeat(job.id, self.worker_id):
+                logfire.warn("Lost the lease on a queued resume job",
+                             job_id=job.id)
+                work.cancel()
+                return
+
+    async def run_job(self, job: QueuedJob) -> None:
+        payload = job.payload
+        suffix = os.path.splitext(payload.get("resume_filename", ""))[1]
+        fd, file_path = tempfile.mkstemp(suffix=suffix,
+                                         dir=get_settings().UPLOAD_DIR)
+        os.close(fd)
+        try:
+            async with aiofiles.open(file_path, "w") as file:
+                await file.write(payload["resume_text"])
+            resume = await self.orchestrator.process_resume_request(
+                payload["job_url"],
+                payload["linkedin_url"],
+                file_path,
+                payload.get("github_url"),
+                bypass_cache=payload.get("bypass_cache", False))
+            # Stored under the job id so /download-resume/{job_id} works
+            await self.result_store.put(job.id, resume)
+            await self.queue.complete(job.id, self.worker_id,
+                                      resume.markdown_content)
+            logfire.info("Completed queued resume job", job_id=job.id)
+        except InvalidRequestError as e:
+            # Bad inputs (unreadable resume, missing or rejected URLs) will
+            # not succeed on retry
+            logfire.error("Queued resume job failed",
+                          job_id=job.id,
+                          error=str(e))
+            await self.queue.fail(job.id, self.worker_id, str(e))
+        except Exception as e:
+            # Upstream failures (rate limits, deadlines, network errors)
+            # are retried until the job runs out of attempts
+            logfire.error("Queued resume job crashed",
+                          job_id=job.id,
+                          error=str(e))
+            await self.queue.fail(job.id, self.worker_id, str(e), retry=True)
+        finally:
+            os.remove(file_path)
+
+    async def process_job(self, job: QueuedJob) -> None:
+        work = asyncio.create_task(self.run_job(job))
+        heartbeat = asyncio.create_task(self.keep_lease(job, work))
+        try:
+            await work
+        except asyncio.CancelledError:
+            if not heartbeat.done():
+                raise
+            # The job now belongs to whichever worker took over the lease
+        finally:
+            heartbeat.cancel()
+
+    async def run(self) -> None:
+        logfire.info("Resume worker started",
+                     worker_id=self.worker_id,
+                     concurrency=self.concurrency)
+        slots = asyncio.Semaphore(self.concurrency)
+        running = set()
+        while True:
+            await slots.acquire()
+            job = await self.queue.claim(self.worker_id)
+            if job is None:
+                slots.release()
+                await asyncio.sleep(self.poll_interval)
+                continue
+            task = asyncio.create_task(self.process_job(job))
+            running.add(task)
+            task.add_done_callback(running.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+
+async def serve(concurrency: int) -> None:
+    settings = get_settings()
+    http_client = get_http_client()
+    http_client.open()
+    if settings.HTTP_WARMUP_CONNECTIONS > 0:
+        await http_client.warm_up(settings.get_warmup_urls(),
+                                  settings.HTTP_WARMUP_CONNECTIONS)
+    try:
+        await ResumeWorker(get_job_queue(), concurrency).run()
+    finally:
+        await http_client.close()
+
+
+def run_worker_process(concurrency: int) -> None:
+    logfire.configure(pydantic_plugin=logfire.PydanticPlugin(record='all'))
+    logfire.instrument_aiohttp_client()
+    asyncio.run(serve(concurrency))
+
+
+def main() -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(
+        description="Run resume generation workers")
+    parser.add_argument("--processes",
+                        type=int,
+                        default=1,
+                        help="Number of worker processes to start")
+    parser.add_argument("--concurrency",
+                        type=int,
+                        default=settings.WORKER_CONCURRENCY,
+                        help="Concurrent jobs per worker process")
+    args = parser.parse_args()
+
+    if args.processes == 1:
+        run_worker_process(args.concurrency)
+        return
+
+    processes = [
+        multiprocessing.Process(target=run_worker_process,
+                                args=(args.concurrency, ))
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()